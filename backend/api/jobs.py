@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from backend.core.job_queue import jobs
+
+router = APIRouter()
+
+def _summary(job):
+    # Everything except the (potentially large) request payload
+    return {k: v for k, v in job.items() if k != "payload"}
+
+@router.get("/api/jobs")
+def list_jobs(status: Optional[str] = Query(None)):
+    return [_summary(job) for job in jobs.list(status)]
+
+@router.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _summary(job)
+
+@router.get("/api/jobs/{job_id}/progress")
+def get_job_progress(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, "status": job["status"], "progress": job["progress"], "error": job["error"]}
+
+@router.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, "status": job["status"]}
@@ -1,19 +1,24 @@
+import asyncio
 import pathlib
 import json
 import random
+import hashlib
+from typing import Optional
 from fastapi import APIRouter, Body
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import requests
 import logging
 import time
 import re
 from config import settings
-from backend.core.prompt_utility import get_podcast_script_prompt
+from backend.core.prompt_utility import get_podcast_outline_prompt, get_podcast_script_prompt, get_podcast_section_prompt
+from backend.core import sentence_index, topic_index
+from backend.core.disk_cache import DiskLRUCache, cache_key
+from backend.core.ollama_client import OllamaError, ollama
+from backend.core.job_queue import jobs
 
 router = APIRouter()
 
-OLLAMA_URL = settings.OLLAMA_URL
-
 class PodcastScriptRequest(BaseModel):
     char1: str
     char2: str
@@ -21,6 +26,11 @@ class PodcastScriptRequest(BaseModel):
     length_minutes: int = 10
     model: str = "gemma3:4b"
     sample_lines: int = 3
+    sample_strategy: str = "topic"  # "topic": lines most relevant to the topic first; "random": uniform draw
+    seed: Optional[int] = None  # fixes sample selection and Ollama sampling; seeded requests are cached
+    background: bool = False  # enqueue as a job and return its ID immediately
+    long_form: Optional[bool] = None  # outline first, then write sections in parallel; default depends on length
+    sections: Optional[int] = None  # number of sections in long-form mode
 
 logger = logging.getLogger("llm_generate_api")
 
@@ -28,31 +38,35 @@ def sanitize_filename(filename):
     # Remove or replace invalid characters for a file name
     return "".join(c if c.isalnum() or c in (" ", "-", "_") else "_" for c in filename).strip()
 
-@router.post("/api/generate_podcast_script")
-def generate_podcast_script(req: PodcastScriptRequest):
-    # Force model to gemma3:4b regardless of what client sends
-    req.model = "gemma3:4b"
-    logger.info(f"Received request: char1={req.char1}, char2={req.char2}, topic={req.topic}, model={req.model}, length={req.length_minutes}")
+# Seeded generations are deterministic, so their responses can be replayed from disk
+llm_cache = DiskLRUCache(settings.LLM_CACHE_DB, settings.LLM_CACHE_MAX_BYTES)
+
+def ollama_options(req: PodcastScriptRequest):
+    return {"seed": req.seed} if req.seed is not None else {}
+
+def llm_cache_key(req: PodcastScriptRequest, prompt, options):
+    if req.seed is None:
+        return None
+    return cache_key(req.model, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), options)
+
+def style_context(req: PodcastScriptRequest):
+    """
+    Returns (char1_samples, char2_samples, script_language) for a request.
+    """
+    rng = random.Random(req.seed) if req.seed is not None else None
     # Load transcript samples for each character
     def get_samples(youtuber, n):
-        transcript_dir = pathlib.Path(settings.TRANSCRIPTS_DIR) / youtuber
-        all_files = list(transcript_dir.glob("*.json"))
-        if not all_files:
-            logger.warning(f"No transcripts found for youtuber: {youtuber}")
-            return []
-        random.shuffle(all_files)
         lines = []
-        for f in all_files:
-            with open(f, encoding="utf-8") as jf:
-                data = json.load(jf)
-                if data.get("transcript"):
-                    # Split transcript into lines (simple split by period)
-                    split_lines = [l.strip() for l in data["transcript"].split(".") if l.strip()]
-                    lines.extend(split_lines)
-            if len(lines) >= n:
-                break
-        logger.info(f"Sampled {min(n, len(lines))} lines for {youtuber}")
-        return random.sample(lines, min(n, len(lines)))
+        if req.sample_strategy == "topic":
+            # Vectorized TF-IDF lookup against the topic; fragments shorter than a clause carry little style
+            lines = topic_index.search(youtuber, req.topic, n, min_words=settings.TOPIC_SAMPLE_MIN_WORDS)
+        if len(lines) < n:
+            # Constant-time draw from the precomputed sentence index (built on first use)
+            lines += [l for l in sentence_index.sample(youtuber, n - len(lines), rng) if l not in lines]
+        if not lines:
+            logger.warning(f"No transcripts found for youtuber: {youtuber}")
+        logger.info(f"Sampled {len(lines)} lines for {youtuber}")
+        return lines
 
     char1_samples = get_samples(req.char1, req.sample_lines)
     char2_samples = get_samples(req.char2, req.sample_lines)
@@ -64,49 +78,240 @@ def generate_podcast_script(req: PodcastScriptRequest):
     char1_is_hindi = any(contains_devanagari(line) for line in char1_samples)
     char2_is_hindi = any(contains_devanagari(line) for line in char2_samples)
     script_language = "Hinglish" if char1_is_hindi or char2_is_hindi else "English"
+    return char1_samples, char2_samples, script_language
+
+def build_script_prompt(req: PodcastScriptRequest):
+    char1_samples, char2_samples, script_language = style_context(req)
+    return get_podcast_script_prompt(req.char1, req.char2, char1_samples, char2_samples, req.topic, req.length_minutes, script_language)
+
+async def cached_generate(req: PodcastScriptRequest, prompt, options):
+    """
+    Runs one Ollama generation through the seeded-response cache. Returns (text, stats); stats is None on a cache hit.
+    """
+    key = llm_cache_key(req, prompt, options)
+    cached = await asyncio.to_thread(llm_cache.get, key) if key else None
+    if cached is not None:
+        return cached.decode("utf-8"), None
+    result = await ollama.generate(req.model, prompt, options)
+    if key and result["response"]:
+        await asyncio.to_thread(llm_cache.put, key, result["response"].encode("utf-8"))
+    return result["response"], result["stats"]
+
+def use_long_form(req: PodcastScriptRequest):
+    return req.long_form if req.long_form is not None else req.length_minutes >= settings.LONG_FORM_MIN_MINUTES
+
+def parse_outline(text):
+    # "1. Title: summary" lines; anything else the model adds is ignored
+    sections = []
+    for line in text.splitlines():
+        match = re.match(r"^\s*\**\s*\d+\s*[.):]\s*(.+?)\s*$", line)
+        if match:
+            sections.append(match.group(1).strip("* "))
+    return sections
+
+def clean_section(text, char1, char2):
+    # Keep only dialogue lines so stitched sections stay in "Speaker: [expression] line" format
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    dialogue = [l for l in lines if l.startswith(f"{char1}:") or l.startswith(f"{char2}:")]
+    return "\n".join(dialogue or lines)
+
+async def run_sectioned_generation(req: PodcastScriptRequest, progress=None, on_event=None):
+    """
+    Long-form generation: one short outline call, then every section is written concurrently from the
+    outline plus hand-off context (previous and next section), and the sections are stitched in order.
+    on_event(kind, data) is awaited for "outline" and each finished "section".
+    """
+    started = time.time()
+    char1_samples, char2_samples, script_language = await asyncio.to_thread(style_context, req)
+    num_sections = req.sections or max(2, round(req.length_minutes / settings.LONG_FORM_MINUTES_PER_SECTION))
+    options = ollama_options(req)
+    outline_prompt = get_podcast_outline_prompt(req.char1, req.char2, req.topic, req.length_minutes, num_sections)
+    if progress:
+        progress(0, num_sections + 1, "Outlining episode")
+    outline_text, _ = await cached_generate(req, outline_prompt, options)
+    sections = parse_outline(outline_text)[:num_sections]
+    if len(sections) < 2:
+        logger.warning(f"Could not parse an outline ({len(sections)} sections), falling back to single-pass generation")
+        prompt = get_podcast_script_prompt(req.char1, req.char2, char1_samples, char2_samples, req.topic, req.length_minutes, script_language)
+        script, stats = await cached_generate(req, prompt, options)
+        save_path = await asyncio.to_thread(save_script, req, script, prompt)
+        return {"script": script, "prompt": prompt, "save_path": str(save_path), "stats": stats}
+    outline = "\n".join(f"{i + 1}. {section}" for i, section in enumerate(sections))
+    logger.info(f"Long-form outline with {len(sections)} sections for topic '{req.topic}'")
+    if on_event:
+        await on_event("outline", {"outline": outline})
+    section_words = req.length_minutes * settings.SCRIPT_WORDS_PER_MINUTE // len(sections)
+    finished = 0
+
+    async def write_section(i):
+        nonlocal finished
+        prompt = get_podcast_section_prompt(
+            req.char1, req.char2, char1_samples, char2_samples, req.topic, outline,
+            i + 1, len(sections), sections[i],
+            sections[i - 1] if i > 0 else "",
+            sections[i + 1] if i + 1 < len(sections) else "",
+            section_words, script_language
+        )
+        text, stats = await cached_generate(req, prompt, options)
+        text = clean_section(text, req.char1, req.char2)
+        finished += 1
+        if progress:
+            progress(finished + 1, len(sections) + 1, f"Wrote section {i + 1}/{len(sections)}")
+        if on_event:
+            await on_event("section", {"index": i, "title": sections[i], "text": text})
+        return text, stats
+
+    # Sections run concurrently, bounded by the Ollama client's in-flight limit
+    results = await asyncio.gather(*(write_section(i) for i in range(len(sections))))
+    script = "\n".join(text for text, _ in results)
+    stats = {
+        "sections": len(sections),
+        "eval_count": sum(s["eval_count"] for _, s in results if s),
+        "wall_seconds": time.time() - started
+    }
+    logger.info(f"Long-form script generated for topic '{req.topic}': {len(sections)} sections in {stats['wall_seconds']:.1f}s")
+    save_path = await asyncio.to_thread(save_script, req, script, outline_prompt)
+    return {"script": script, "prompt": outline_prompt, "outline": outline, "save_path": str(save_path), "stats": stats}
 
-    # Build prompt
-    prompt = get_podcast_script_prompt(req.char1, req.char2, char1_samples, char2_samples, req.topic, req.length_minutes, script_language)
+def save_script(req: PodcastScriptRequest, script, prompt):
+    save_dir = pathlib.Path(settings.SAVED_SCRIPTS_DIR) / sanitize_filename(req.topic)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    filename = f"{sanitize_filename(req.char1)}_{sanitize_filename(req.char2)}_{req.length_minutes}min_{timestamp}.json"
+    save_path = save_dir / filename
+    save_data = {
+        "char1": req.char1,
+        "char2": req.char2,
+        "topic": req.topic,
+        "length_minutes": req.length_minutes,
+        "timestamp": timestamp,
+        "script": script,
+        "prompt": prompt
+    }
+    with open(save_path, 'w', encoding='utf-8') as f:
+        json.dump(save_data, f, ensure_ascii=False, indent=2)
+    logger.info(f"Saved generated script to {save_path}")
+    return save_path
+
+@router.post("/api/generate_podcast_script")
+async def generate_podcast_script(req: PodcastScriptRequest):
+    if req.background:
+        job = jobs.submit("generate_podcast_script", req.model_dump(exclude={"background"}))
+        return {"job_id": job["id"], "status": job["status"]}
+    return await run_generation(req)
+
+async def run_generation(req: PodcastScriptRequest, progress=None):
+    # Force model to gemma3:4b regardless of what client sends
+    req.model = "gemma3:4b"
+    logger.info(f"Received request: char1={req.char1}, char2={req.char2}, topic={req.topic}, model={req.model}, length={req.length_minutes}")
+    if use_long_form(req):
+        try:
+            return await run_sectioned_generation(req, progress)
+        except OllamaError as e:
+            logger.error(f"Ollama API error: {e}")
+            return {"error": f"Ollama API error: {e}"}
+    prompt = await asyncio.to_thread(build_script_prompt, req)
+    options = ollama_options(req)
+    key = llm_cache_key(req, prompt, options)
+    cached = await asyncio.to_thread(llm_cache.get, key) if key else None
+    if cached is not None:
+        logger.info(f"LLM cache hit for seeded request (seed={req.seed})")
+        script = cached.decode("utf-8")
+        save_path = await asyncio.to_thread(save_script, req, script, prompt)
+        return {"script": script, "prompt": prompt, "save_path": str(save_path), "cached": True}
 
     logger.info(f"Prompt constructed for LLM call. Model: {req.model}")
+    if progress:
+        progress(0, 1, "Generating script")
     try:
-        # Call Ollama
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": req.model,
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=600  # Allow up to 10 minutes for LLM response
-        )
-        logger.info(f"Ollama API response status: {response.status_code}")
-        if response.status_code == 200:
-            result = response.json()
-            script = result.get("response", "")
-            logger.info(f"LLM script generation successful for topic '{req.topic}'")
-            # Save the script
-            save_dir = pathlib.Path(settings.SAVED_SCRIPTS_DIR) / sanitize_filename(req.topic)
-            save_dir.mkdir(parents=True, exist_ok=True)
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"{sanitize_filename(req.char1)}_{sanitize_filename(req.char2)}_{req.length_minutes}min_{timestamp}.json"
-            save_path = save_dir / filename
-            save_data = {
-                "char1": req.char1,
-                "char2": req.char2,
-                "topic": req.topic,
-                "length_minutes": req.length_minutes,
-                "timestamp": timestamp,
-                "script": script,
-                "prompt": prompt
-            }
-            with open(save_path, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Saved generated script to {save_path}")
-            return {"script": script, "prompt": prompt, "save_path": str(save_path)}
-        else:
-            logger.error(f"Ollama API error: {response.text}")
-            return {"error": f"Ollama API error: {response.text}"}
+        # Call Ollama through the shared pooled client; the request no longer holds a threadpool thread
+        result = await ollama.generate(req.model, prompt, options)
+        script = result["response"]
+        stats = result["stats"]
+        logger.info(f"LLM script generation successful for topic '{req.topic}': {stats['eval_count']} tokens at {stats['tokens_per_second']:.1f} tok/s")
+        if key and script:
+            await asyncio.to_thread(llm_cache.put, key, script.encode("utf-8"))
+        save_path = await asyncio.to_thread(save_script, req, script, prompt)
+        return {"script": script, "prompt": prompt, "save_path": str(save_path), "stats": stats}
+    except OllamaError as e:
+        logger.error(f"Ollama API error: {e}")
+        return {"error": f"Ollama API error: {e}"}
     except Exception as e:
         logger.error(f"Exception during LLM call: {e}")
         return {"error": str(e)}
+
+async def _generation_job(payload, ctx):
+    return await run_generation(PodcastScriptRequest(**payload), progress=ctx.progress)
+
+jobs.register("generate_podcast_script", _generation_job, pool="llm")
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def sectioned_events(req: PodcastScriptRequest):
+    # Long-form streaming: "outline", then "section" events as sections finish (in any order), then "done"
+    queue = asyncio.Queue()
+
+    async def on_event(kind, data):
+        await queue.put((kind, data))
+
+    task = asyncio.create_task(run_sectioned_generation(req, on_event=on_event))
+    task.add_done_callback(lambda _: queue.put_nowait((None, None)))
+    try:
+        while True:
+            kind, data = await queue.get()
+            if kind is None:
+                break
+            yield sse_event(kind, data)
+        yield sse_event("done", task.result())
+    except Exception as e:
+        logger.error(f"Exception during long-form streaming generation: {e}")
+        yield sse_event("error", {"error": str(e)})
+    finally:
+        task.cancel()
+
+@router.post("/api/generate_podcast_script_stream")
+async def generate_podcast_script_stream(req: PodcastScriptRequest):
+    """
+    Same as /api/generate_podcast_script, but forwards tokens as server-sent events while Ollama generates.
+    Events: "prompt" once, "token" per chunk, then "done" with the saved script (or "error").
+    """
+    req.model = "gemma3:4b"
+    logger.info(f"Received streaming request: char1={req.char1}, char2={req.char2}, topic={req.topic}, model={req.model}, length={req.length_minutes}")
+    if use_long_form(req):
+        return StreamingResponse(sectioned_events(req), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    prompt = await asyncio.to_thread(build_script_prompt, req)
+    options = ollama_options(req)
+    key = llm_cache_key(req, prompt, options)
+
+    async def events():
+        yield sse_event("prompt", {"prompt": prompt})
+        cached = await asyncio.to_thread(llm_cache.get, key) if key else None
+        if cached is not None:
+            logger.info(f"LLM cache hit for seeded request (seed={req.seed})")
+            script = cached.decode("utf-8")
+            yield sse_event("token", {"token": script})
+            save_path = await asyncio.to_thread(save_script, req, script, prompt)
+            yield sse_event("done", {"script": script, "prompt": prompt, "save_path": str(save_path), "cached": True})
+            return
+        parts = []
+        stats = None
+        try:
+            async for kind, value in ollama.stream(req.model, prompt, options):
+                if kind == "token":
+                    parts.append(value)
+                    yield sse_event("token", {"token": value})
+                else:
+                    stats = value
+        except Exception as e:
+            logger.error(f"Exception during streaming LLM call: {e}")
+            yield sse_event("error", {"error": str(e)})
+            return
+        script = "".join(parts)
+        logger.info(f"Streaming LLM script generation finished for topic '{req.topic}'")
+        if key and script:
+            await asyncio.to_thread(llm_cache.put, key, script.encode("utf-8"))
+        save_path = await asyncio.to_thread(save_script, req, script, prompt)
+        yield sse_event("done", {"script": script, "prompt": prompt, "save_path": str(save_path), "stats": stats})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
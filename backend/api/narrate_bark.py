@@ -1,16 +1,18 @@
-import os
 import pathlib
 import json
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from pydub import AudioSegment
-import tempfile
 import logging
-import torch
-from bark import SAMPLE_RATE, generate_audio
-import numpy as np
+import time
+from bark import SAMPLE_RATE
 from config import settings
 from backend.core.prompt_utility import get_bark_narration_prompt
+from backend.core import audio_assembly
+from backend.core.audio_cache import get_waveform, line_key, put_waveform
+from backend.core.bark_models import TIERS, bark_models
+from backend.core.bark_pool import bark_pools
+from backend.core.job_queue import JobCancelled, jobs
 
 router = APIRouter()
 
@@ -22,19 +24,59 @@ class NarrateScriptBarkRequest(BaseModel):
     char1: str
     char2: str
     output_format: str = "wav"
-
-def speedup_audio(audio_segment, speed=1.2):
-    # Use pydub to speed up audio without changing pitch too much
-    return audio_segment._spawn(audio_segment.raw_data, overrides={
-        "frame_rate": int(audio_segment.frame_rate * speed)
-    }).set_frame_rate(audio_segment.frame_rate)
+    quality: str = "standard"  # "standard" or "draft" (small int8 models, no fine stage; for quick listen-throughs)
+    background: bool = False  # enqueue as a job and return its ID immediately
 
 @router.post("/api/narrate_script_bark")
 def narrate_script_bark(req: NarrateScriptBarkRequest):
-    logger.info(f"Bark Narrate request: char1={req.char1}, char2={req.char2}, output_format={req.output_format}")
+    if req.background:
+        job = jobs.submit("narrate_script_bark", req.model_dump(exclude={"background"}))
+        return {"job_id": job["id"], "status": job["status"]}
+    return run_bark_narration(req)
+
+def synthesize_lines(items, tier="standard", progress=None):
+    """
+    Synthesizes [(text, preset)] and returns (waveforms in script order, number served from the cache).
+    Uncached lines run across the tier's process pool when BARK_WORKERS > 1, otherwise one by one here.
+    """
+    # Lines synthesized before with the same preset, text and tier come from the audio cache
+    keys = [line_key("bark", preset, text, {"tier": tier, **TIERS[tier]}) for text, preset in items]
+    audio_arrays = [get_waveform(key) for key in keys]
+    missing = [i for i, audio in enumerate(audio_arrays) if audio is None]
+    cached = len(items) - len(missing)
+    logger.info(f"Audio cache: {cached}/{len(items)} lines cached, synthesizing {len(missing)}")
+
+    def report(done, total):
+        if progress:
+            progress(cached + done, len(items), f"Synthesized line {cached + done}/{len(items)}")
+
+    if bark_pools[tier].enabled:
+        synthesized = bark_pools[tier].synthesize([items[i] for i in missing], progress=report)
+    else:
+        synthesized = []
+        for done, i in enumerate(missing, 1):
+            text, preset = items[i]
+            logger.info(f"Synthesizing line {i + 1}/{len(items)}: {text[:40]}...")
+            # Models stay resident between requests (GPU when available) and presets are cached in memory
+            synthesized.append(bark_models.generate(text, preset, tier))
+            report(done, len(missing))
+    for i, audio in zip(missing, synthesized):
+        put_waveform(keys[i], audio)
+        audio_arrays[i] = audio
+    return audio_arrays, cached
+
+def bark_items(req: NarrateScriptBarkRequest):
+    """
+    Parses the script into [(text, preset)] for the lines spoken by char1 or char2.
+    """
     # Split script into lines by speaker
     lines = [l.strip() for l in req.script.split("\n") if l.strip()]
-    segments = []
+    # Use a Bark preset for better voice quality
+    char_presets = {
+        req.char1: "v2/en_speaker_6",  # Preset for char1
+        req.char2: "v2/en_speaker_3"   # Preset for char2
+    }
+    items = []
     for idx, line in enumerate(lines):
         logger.info(f"Processing line {idx}: {line[:60]}")
         if line.startswith(f"{req.char1}:"):
@@ -49,66 +91,139 @@ def narrate_script_bark(req: NarrateScriptBarkRequest):
             logger.warning(f"Skipping line {idx}: empty text after speaker")
             continue
         # Remove expressions in square brackets
-        import re
         # text_clean = re.sub(r"\[[^\]]*\]", "", text).strip()
         text_clean = text.strip()
-        logger.info(f"Synthesizing line for {speaker}: {text_clean[:40]}...")
-        # Use a Bark preset for better voice quality
-        char_presets = {
-            req.char1: "v2/en_speaker_6",  # Preset for char1
-            req.char2: "v2/en_speaker_3"   # Preset for char2
-        }
-        bark_preset = char_presets.get(speaker, "v2/en_speaker_6")
-        try:
-            # Ensure Bark uses GPU if available
-            if torch.cuda.is_available():
-                torch_device = torch.device("cuda")
-                logger.info("Using GPU for Bark TTS: %s", torch.cuda.get_device_name(0))
-            else:
-                torch_device = torch.device("cpu")
-                logger.info("Using CPU for Bark TTS")
-            # Bark uses the default device, but you can set it globally if needed
-            audio_array = generate_audio(text_clean, history_prompt=bark_preset)
-            audio_int16 = (audio_array * 32767).astype(np.int16)  # Convert to int16 for WAV export
-            if hasattr(audio_array, 'to'):
-                audio_array = audio_array.to(torch_device)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tf:
-                seg = AudioSegment(
-                    audio_int16.tobytes(),
-                    frame_rate=SAMPLE_RATE,
-                    sample_width=2,
-                    channels=1
-                )
-                seg_fast = speedup_audio(seg, speed=1.2)
-                seg_fast.export(tf.name, format="wav")
-                segments.append(tf.name)
-        except Exception as e:
-            logger.error(f"Exception during Bark TTS for line {idx}: {e}")
-            return {"error": f"Exception during Bark TTS: {e}"}
+        items.append((text_clean, char_presets.get(speaker, "v2/en_speaker_6")))
+    return items
+
+def sanitize_filename(filename):
+    return "".join(c if c.isalnum() or c in (" ", "-", "_") else "_" for c in filename).strip()
+
+def bark_output_path(req: NarrateScriptBarkRequest):
+    """
+    narrated_podcasts_bark/{topic}/{char1}_{char2}_{timestamp}.{format}
+    """
+    topic_safe = sanitize_filename(str(req.topic))
+    topic_dir = pathlib.Path(settings.NARRATED_PODCASTS_BARK_DIR) / topic_safe
+    topic_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    filename = f"{sanitize_filename(req.char1)}_{sanitize_filename(req.char2)}_{timestamp}.{req.output_format}"
+    return topic_dir / filename
+
+def run_bark_narration(req: NarrateScriptBarkRequest, progress=None):
+    logger.info(f"Bark Narrate request: char1={req.char1}, char2={req.char2}, output_format={req.output_format}, quality={req.quality}")
+    if req.quality not in TIERS:
+        return {"error": f"Unknown quality tier '{req.quality}', expected one of {sorted(TIERS)}"}
+    items = bark_items(req)
+    started = time.time()
+    try:
+        audio_arrays, cached_lines = synthesize_lines(items, req.quality, progress)
+    except JobCancelled:
+        raise
+    except Exception as e:
+        logger.error(f"Exception during Bark TTS: {e}")
+        return {"error": f"Exception during Bark TTS: {e}"}
+    # Real-time factor: wall-clock synthesis seconds per second of raw (pre speed-up) audio
+    compute_seconds = time.time() - started
+    audio_seconds = sum(len(a) for a in audio_arrays) / SAMPLE_RATE
+    real_time_factor = compute_seconds / audio_seconds if audio_seconds else None
+    logger.info(f"Bark {req.quality} synthesis: {audio_seconds:.1f}s of audio in {compute_seconds:.1f}s (RTF {real_time_factor})")
+    # Assembled in memory: each line sped up, then all lines and pauses written into one buffer
+    segments = [audio_assembly.speed_up(audio_assembly.to_float(a), speed=1.2) for a in audio_arrays]
+    if progress:
+        progress(len(items), len(items), "Stitching audio")
     # Stitch audio segments
     if not segments:
         logger.error("No audio segments generated.")
         return {"error": "No audio segments generated."}
     try:
-        combined = AudioSegment.empty()
-        for seg in segments:
-            audio = AudioSegment.from_file(seg)
-            combined += audio + AudioSegment.silent(duration=400)  # 0.4s pause
+        combined = audio_assembly.assemble(segments, SAMPLE_RATE)
         # Save audio in narrated_podcasts_bark/{topic}/
-        def sanitize_filename(filename):
-            return "".join(c if c.isalnum() or c in (" ", "-", "_") else "_" for c in filename).strip()
-        topic_safe = sanitize_filename(str(req.topic))
-        topic_dir = pathlib.Path(settings.NARRATED_PODCASTS_BARK_DIR) / topic_safe
-        topic_dir.mkdir(parents=True, exist_ok=True)
-        import time
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        filename = f"{sanitize_filename(req.char1)}_{sanitize_filename(req.char2)}_{timestamp}.{req.output_format}"
-        output_path = topic_dir / filename
-        combined.export(output_path, format=req.output_format)
-        for seg in segments:
-            os.remove(seg)
+        output_path = bark_output_path(req)
+        audio_assembly.encode(combined, SAMPLE_RATE, output_path, req.output_format)
         logger.info(f"Bark narrated podcast saved to {output_path}")
-        return {"audio_path": str(output_path)}
+        return {
+            "audio_path": str(output_path),
+            "tier": req.quality,
+            "compute_seconds": compute_seconds,
+            "audio_seconds": audio_seconds,
+            "real_time_factor": real_time_factor,
+            "cached_lines": cached_lines
+        }
     except Exception as e:
         logger.error(f"Exception during Bark audio stitching/export: {e}")
         return {"error": f"Exception during Bark audio stitching/export: {e}"}
+
+def iter_lines(items, tier="standard"):
+    """
+    Yields each line's waveform in script order as soon as it is available: cached lines immediately,
+    the rest as they finish (across the process pool when enabled, so later lines are already running).
+    """
+    keys = [line_key("bark", preset, text, {"tier": tier, **TIERS[tier]}) for text, preset in items]
+    audio_arrays = [get_waveform(key) for key in keys]
+    missing = [items[i] for i, audio in enumerate(audio_arrays) if audio is None]
+    if bark_pools[tier].enabled:
+        synthesized = bark_pools[tier].iter_synthesize(missing)
+    else:
+        synthesized = (bark_models.generate(text, preset, tier) for text, preset in missing)
+    try:
+        for key, audio in zip(keys, audio_arrays):
+            if audio is None:
+                audio = next(synthesized)
+                put_waveform(key, audio)
+            yield audio
+    finally:
+        synthesized.close()
+
+@router.post("/api/narrate_script_bark/stream")
+def narrate_script_bark_stream(req: NarrateScriptBarkRequest):
+    """
+    Progressive narration: a WAV stream that starts after the first line and grows line by line.
+    The full episode is still saved as in /api/narrate_script_bark; its path is in the X-Audio-Path header.
+    That header is sent before synthesis, so if synthesis fails mid-stream the stream ends early and the
+    file is not written (the failure is logged).
+    """
+    if req.quality not in TIERS:
+        return {"error": f"Unknown quality tier '{req.quality}', expected one of {sorted(TIERS)}"}
+    items = bark_items(req)
+    if not items:
+        logger.error("No audio segments generated.")
+        return {"error": "No audio segments generated."}
+    output_path = bark_output_path(req)
+    return StreamingResponse(stream_bark_narration(req, items, output_path), media_type="audio/wav", headers={"X-Audio-Path": str(output_path), "Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def stream_bark_narration(req: NarrateScriptBarkRequest, items, output_path):
+    segments = []
+    yield audio_assembly.wav_stream_header(SAMPLE_RATE)
+    try:
+        for audio in iter_lines(items, req.quality):
+            samples = audio_assembly.speed_up(audio_assembly.to_float(audio), speed=1.2)
+            segments.append(samples)
+            yield audio_assembly.stream_chunk(samples, SAMPLE_RATE)
+        audio_assembly.encode(audio_assembly.assemble(segments, SAMPLE_RATE), SAMPLE_RATE, output_path, req.output_format)
+    except GeneratorExit:
+        logger.warning(f"Client left the Bark narration stream after {len(segments)}/{len(items)} lines; {output_path} was not saved")
+        raise
+    except Exception as e:
+        logger.error(f"Exception during streamed Bark narration after {len(segments)}/{len(items)} lines, {output_path} was not saved: {e}")
+        raise
+    logger.info(f"Streamed Bark narration saved to {output_path}")
+
+@router.get("/api/bark/models")
+def bark_model_status():
+    return {**bark_models.status(), "pools": {tier: pool.status() for tier, pool in bark_pools.items()}}
+
+@router.post("/api/bark/models/load")
+def load_bark_models(warm_up: bool = True):
+    bark_models.load(warm_up=warm_up)
+    return bark_models.status()
+
+@router.post("/api/bark/models/unload")
+def unload_bark_models():
+    bark_models.unload()
+    return bark_models.status()
+
+def _bark_narration_job(payload, ctx):
+    return run_bark_narration(NarrateScriptBarkRequest(**payload), progress=ctx.progress)
+
+jobs.register("narrate_script_bark", _bark_narration_job, pool="tts")
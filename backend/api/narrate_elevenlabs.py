@@ -1,16 +1,21 @@
-import os
 import pathlib
 import json
-import requests
+import time
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, Body
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from pydub import AudioSegment
-import tempfile
 import logging
 import re
 from config import settings
 from backend.core.prompt_utility import get_elevenlabs_narration_prompt
+from backend.core import audio_assembly
+from backend.core.audio_cache import audio_cache, line_key
+from backend.core.elevenlabs_client import ElevenLabsError, elevenlabs
+from backend.core.job_queue import JobCancelled, jobs
 
 router = APIRouter()
 
@@ -19,6 +24,7 @@ router = APIRouter()
 ELEVENLABS_API_KEY = settings.ELEVENLABS_API_KEY
 ELEVENLABS_VOICE_ID1 = settings.ELEVENLABS_VOICE_ID1
 ELEVENLABS_VOICE_ID2 = settings.ELEVENLABS_VOICE_ID2
+ELEVENLABS_AUDIO_FORMAT = settings.ELEVENLABS_OUTPUT_FORMAT.split("_")[0]  # container of the line audio, "mp3" for mp3_44100_128
 
 logger = logging.getLogger("narrate_script_api")
 
@@ -29,24 +35,27 @@ class NarrateScriptRequest(BaseModel):
     voice1: str = ELEVENLABS_VOICE_ID1  # default to env voice
     voice2: str = ELEVENLABS_VOICE_ID2  # can be changed per character
     output_format: str = "mp3"
+    background: bool = False  # enqueue as a job and return its ID immediately
 
 @router.post("/api/narrate_script")
 def narrate_script(req: NarrateScriptRequest):
-    logger.info(f"Narrate request: char1={req.char1}, char2={req.char2}, voice1={req.voice1}, voice2={req.voice2}, output_format={req.output_format}")
-    if not ELEVENLABS_API_KEY:
-        logger.error("ElevenLabs API key not set in .env")
-        return {"error": "ElevenLabs API key not set in .env"}
-    # Split script into lines by speaker
+    if req.background:
+        job = jobs.submit("narrate_script", req.model_dump(exclude={"background"}))
+        return {"job_id": job["id"], "status": job["status"]}
+    return run_narration(req)
+
+def script_lines(req: NarrateScriptRequest):
+    """
+    Parses the script into [(line index, voice_id, cleaned text)] for the lines spoken by char1 or char2.
+    """
+    items = []
     lines = [l.strip() for l in req.script.split("\n") if l.strip()]
-    segments = []
     for idx, line in enumerate(lines):
         logger.info(f"Processing line {idx}: {line[:60]}")
         if line.startswith(f"{req.char1}:"):
-            speaker = req.char1
             voice_id = req.voice1
             text = line[len(f"{req.char1}:"):].strip()
         elif line.startswith(f"{req.char2}:"):
-            speaker = req.char2
             voice_id = req.voice2
             text = line[len(f"{req.char2}:"):].strip()
         else:
@@ -55,77 +64,207 @@ def narrate_script(req: NarrateScriptRequest):
         if not text:
             logger.warning(f"Skipping line {idx}: empty text after speaker")
             continue
-        logger.info(f"Synthesizing line for {speaker}: {text[:40]}...")
-        tts_url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-        headers = {"xi-api-key": ELEVENLABS_API_KEY}
         # Remove expressions in square brackets from text
         text_clean = re.sub(r"\[[^\]]*\]", "", text).strip()
         # text_clean = get_elevenlabs_narration_prompt(text_clean)
-        payload = {
-            "text": text_clean,
-            "voice_settings": {"stability": 0.5, "similarity_boost": 0.75}
-        }
-        try:
-            resp = requests.post(tts_url, headers=headers, json=payload)
-            logger.info(f"TTS API status for line {idx}: {resp.status_code}")
-            if resp.status_code == 200:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{req.output_format}") as tf:
-                    tf.write(resp.content)
-                    tf.flush()
-                    segments.append(tf.name)
-            else:
-                logger.error(f"Failed to synthesize line {idx}: {resp.text}")
-                return {"error": f"Failed to synthesize line: {resp.text}"}
-        except Exception as e:
-            logger.error(f"Exception during TTS for line {idx}: {e}")
-            return {"error": f"Exception during TTS: {e}"}
-    # Stitch audio segments
-    if not segments:
+        items.append((idx, voice_id, text_clean))
+    return items
+
+def synthesize_line(idx, voice_id, text):
+    """
+    Encoded audio for one line, from the audio cache or the API. Returns (audio bytes, served_from_cache).
+    """
+    voice_settings = {"stability": 0.5, "similarity_boost": 0.75}
+    # Model and output format change the audio (and the mp3 frame format the passthrough writer joins)
+    key = line_key("elevenlabs", voice_id, text, {**voice_settings, "model_id": settings.ELEVENLABS_MODEL_ID, "output_format": settings.ELEVENLABS_OUTPUT_FORMAT})
+    audio_bytes = audio_cache.get(key)
+    if audio_bytes is not None:
+        logger.info(f"Line {idx} served from the audio cache")
+        return audio_bytes, True
+    logger.info(f"Synthesizing line {idx}: {text[:40]}...")
+    try:
+        audio_bytes = elevenlabs.text_to_speech(voice_id, text, voice_settings)
+    except ElevenLabsError as e:
+        logger.error(f"Failed to synthesize line {idx}: {e}")
+        raise
+    audio_cache.put(key, audio_bytes)
+    return audio_bytes, False
+
+# A bad API key or a plan without access fails every request the same way
+AUTH_FAILURE_STATUSES = (401, 403)
+
+def iter_synthesized(items, window=None):
+    """
+    Yields (line index, audio bytes or None, served_from_cache, error) in script order as soon as each line
+    and all earlier ones are done. Up to ELEVENLABS_MAX_IN_FLIGHT lines are requested at once and at most
+    window lines are held, so memory does not grow with the script. A line that still fails after its
+    retries is yielded with its error and does not stop the others, except an authentication or permission
+    error (AUTH_FAILURE_STATUSES), which would fail every line: it is raised and no further lines are sent.
+    """
+    window = window or 2 * elevenlabs.max_in_flight
+    executor = ThreadPoolExecutor(max_workers=elevenlabs.max_in_flight)
+    lines = iter(items)
+    pending = deque()
+    try:
+        while True:
+            for item in itertools.islice(lines, window - len(pending)):
+                pending.append((item[0], executor.submit(synthesize_line, *item)))
+            if not pending:
+                return
+            idx, future = pending.popleft()
+            try:
+                audio_bytes, cached = future.result()
+                yield idx, audio_bytes, cached, None
+            except ElevenLabsError as e:
+                if e.status_code in AUTH_FAILURE_STATUSES:
+                    raise
+                yield idx, None, False, str(e)
+            except Exception as e:
+                yield idx, None, False, str(e)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def episode_writer(output_path, output_format):
+    """
+    mp3 episodes join the mp3 lines as-is; WAV episodes are written line by line; other formats are
+    assembled in memory and encoded once.
+    """
+    if output_format == "mp3" and ELEVENLABS_AUDIO_FORMAT == "mp3":
+        return audio_assembly.Mp3PassthroughWriter(output_path)
+    if output_format == "wav":
+        return audio_assembly.WavWriter(output_path)
+    return audio_assembly.BufferedWriter(output_path, output_format)
+
+def add_line(writer, audio_bytes, decoded=None):
+    if isinstance(writer, audio_assembly.Mp3PassthroughWriter):
+        writer.add(audio_bytes)
+    else:
+        writer.add(*(decoded or audio_assembly.decode(audio_bytes, ELEVENLABS_AUDIO_FORMAT)))
+
+def sanitize_filename(filename):
+    return "".join(c if c.isalnum() or c in (" ", "-", "_") else "_" for c in filename).strip()
+
+def narration_output_path(req: NarrateScriptRequest):
+    """
+    narrated_podcasts/{topic}/{topic}_{char1}_{char2}_{length}min_{timestamp}.{format}, with the filename matching saved_scripts.
+    """
+    # Try to extract topic, char1, char2, length_minutes, timestamp from request or script
+    topic = getattr(req, 'topic', None)
+    length_minutes = getattr(req, 'length_minutes', None)
+    timestamp = None
+    # Try to parse from script if not present
+    try:
+        script_json = json.loads(req.script)
+        topic = script_json.get('topic', topic)
+        length_minutes = script_json.get('length_minutes', length_minutes)
+        timestamp = script_json.get('timestamp', None)
+    except Exception:
+        pass
+    # If not found, fallback to defaults
+    if not topic:
+        topic = "Unknown_Topic"
+    if not length_minutes:
+        length_minutes = 10
+    if not timestamp:
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+    topic_dir = pathlib.Path(settings.NARRATED_PODCASTS_DIR) / sanitize_filename(str(topic))
+    topic_dir.mkdir(parents=True, exist_ok=True)
+    # Add topic to filename as well
+    filename = f"{sanitize_filename(str(topic))}_{sanitize_filename(req.char1)}_{sanitize_filename(req.char2)}_{length_minutes}min_{timestamp}.{req.output_format}"
+    return topic_dir / filename
+
+def run_narration(req: NarrateScriptRequest, progress=None):
+    logger.info(f"Narrate request: char1={req.char1}, char2={req.char2}, voice1={req.voice1}, voice2={req.voice2}, output_format={req.output_format}")
+    if not ELEVENLABS_API_KEY:
+        logger.error("ElevenLabs API key not set in .env")
+        return {"error": "ElevenLabs API key not set in .env"}
+    items = script_lines(req)
+    if not items:
         logger.error("No audio segments generated.")
         return {"error": "No audio segments generated."}
+    output_path = narration_output_path(req)
+    cached_lines = 0
+    failures = {}
+    writer = episode_writer(output_path, req.output_format)
     try:
-        combined = AudioSegment.empty()
-        for seg in segments:
-            audio = AudioSegment.from_file(seg)
-            combined += audio + AudioSegment.silent(duration=400)  # 0.4s pause
-        # --- Updated audio saving structure ---
-        # Save audio in narrated_podcasts/{topic}/ with filename matching saved_scripts
-        def sanitize_filename(filename):
-            return "".join(c if c.isalnum() or c in (" ", "-", "_") else "_" for c in filename).strip()
-        # Try to extract topic, char1, char2, length_minutes, timestamp from request or script
-        topic = getattr(req, 'topic', None)
-        length_minutes = getattr(req, 'length_minutes', None)
-        timestamp = None
-        # If topic is provided directly in the request, use it
-        if not topic and hasattr(req, 'topic'):
-            topic = req.topic
-        # Try to parse from script if not present
-        try:
-            script_json = json.loads(req.script)
-            topic = script_json.get('topic', topic)
-            length_minutes = script_json.get('length_minutes', length_minutes)
-            timestamp = script_json.get('timestamp', None)
-        except Exception:
-            pass
-        # If not found, fallback to defaults
-        if not topic:
-            topic = "Unknown_Topic"
-        if not length_minutes:
-            length_minutes = 10
-        if not timestamp:
-            import time
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-        topic_dir = pathlib.Path(settings.NARRATED_PODCASTS_DIR) / sanitize_filename(str(topic))
-        topic_dir.mkdir(parents=True, exist_ok=True)
-        # Add topic to filename as well
-        filename = f"{sanitize_filename(str(topic))}_{sanitize_filename(req.char1)}_{sanitize_filename(req.char2)}_{length_minutes}min_{timestamp}.{req.output_format}"
-        output_path = topic_dir / filename
-        combined.export(output_path, format=req.output_format)
-        # Clean up temp files
-        for seg in segments:
-            os.remove(seg)
-        logger.info(f"Narrated podcast saved to {output_path}")
-        return {"audio_path": str(output_path)}
+        # Each line goes into the episode file as soon as it and the lines before it are done
+        with writer:
+            for done, (idx, audio_bytes, cached, error) in enumerate(iter_synthesized(items), 1):
+                if progress:
+                    progress(done, len(items), f"Synthesized line {done}/{len(items)}")
+                cached_lines += cached
+                if error:
+                    failures[idx] = error
+                    continue
+                add_line(writer, audio_bytes)
+    except JobCancelled:
+        raise
+    except ElevenLabsError as e:
+        logger.error(f"ElevenLabs rejected the request (HTTP {e.status_code}), stopping: {e}")
+        return {"error": f"Failed to synthesize line: {e}"}
     except Exception as e:
         logger.error(f"Exception during audio stitching/export: {e}")
         return {"error": f"Exception during audio stitching/export: {e}"}
+    if failures:
+        logger.error(f"{len(failures)} of {len(items)} lines failed to synthesize: {failures}")
+    if not writer.lines:
+        return {"error": f"Failed to synthesize line: {next(iter(failures.values()))}", "failed_lines": failures}
+    logger.info(f"Narrated podcast saved to {output_path}")
+    # Lines that failed after retries are left out of the episode and listed here; they are not cached,
+    # so narrating the same script again only requests those lines
+    return {"audio_path": str(output_path), "cached_lines": cached_lines, "failed_lines": failures}
+
+@router.post("/api/narrate_script/stream")
+def narrate_script_stream(req: NarrateScriptRequest):
+    """
+    Progressive narration: a WAV stream that starts after the first line and grows line by line.
+    The full episode is still saved as in /api/narrate_script; its path is in the X-Audio-Path header.
+    That header is sent before synthesis, so if synthesis fails mid-stream (or every line fails) the
+    stream ends early and the file is not written (the failure is logged).
+    """
+    if not ELEVENLABS_API_KEY:
+        return {"error": "ElevenLabs API key not set in .env"}
+    items = script_lines(req)
+    if not items:
+        logger.error("No audio segments generated.")
+        return {"error": "No audio segments generated."}
+    output_path = narration_output_path(req)
+    return StreamingResponse(stream_narration(req, items, output_path), media_type="audio/wav", headers={"X-Audio-Path": str(output_path), "Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def stream_narration(req: NarrateScriptRequest, items, output_path):
+    # The stream's sample rate is the first line's; later lines are resampled to it.
+    # The saved episode is written alongside, line by line, by the same writer as /api/narrate_script.
+    sample_rate = None
+    writer = episode_writer(output_path, req.output_format)
+    try:
+        with writer:
+            for idx, audio_bytes, _, error in iter_synthesized(items):
+                if error:
+                    logger.error(f"Skipping line {idx} in the stream: {error}")
+                    continue
+                samples, rate = audio_assembly.decode(audio_bytes, ELEVENLABS_AUDIO_FORMAT)
+                if sample_rate is None:
+                    sample_rate = rate
+                    yield audio_assembly.wav_stream_header(sample_rate)
+                add_line(writer, audio_bytes, (samples, rate))
+                yield audio_assembly.stream_chunk(audio_assembly.resample(samples, rate, sample_rate), sample_rate)
+    except GeneratorExit:
+        logger.warning(f"Client left the narration stream after {writer.lines}/{len(items)} lines; {output_path} was not saved")
+        raise
+    except Exception as e:
+        logger.error(f"Exception during streamed narration after {writer.lines}/{len(items)} lines, {output_path} was not saved: {e}")
+        raise
+    if writer.lines:
+        logger.info(f"Streamed narration saved to {output_path}")
+    else:
+        logger.error(f"Every line failed to synthesize, {output_path} was not saved")
+
+@router.get("/api/audio_cache")
+def audio_cache_stats():
+    # Shared by ElevenLabs and Bark narration
+    return audio_cache.stats()
+
+def _narration_job(payload, ctx):
+    return run_narration(NarrateScriptRequest(**payload), progress=ctx.progress)
+
+jobs.register("narrate_script", _narration_job, pool="tts")
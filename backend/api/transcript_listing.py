@@ -2,11 +2,14 @@ import pathlib
 from fastapi import APIRouter
 from typing import List, Dict
 from config import settings
+from backend.core import corpus_store
 
 router = APIRouter()
 
 @router.get("/api/list_youtubers", response_model=List[str])
 def list_youtubers():
+    if corpus_store.enabled():
+        return corpus_store.list_channels()
     transcripts_dir = pathlib.Path(settings.TRANSCRIPTS_DIR)
     if not transcripts_dir.exists():
         return []
@@ -14,6 +17,10 @@ def list_youtubers():
 
 @router.get("/api/list_transcripts", response_model=Dict[str, List[str]])
 def list_transcripts(youtuber: str):
+    if corpus_store.enabled():
+        # Same names as the per-video JSON files, read from the corpus index
+        entries = corpus_store.list_videos(youtuber)
+        return {youtuber: [f"{e['meta'].get('video_title')}_{e['video_id']}.json" for e in entries]}
     transcripts_dir = pathlib.Path(settings.TRANSCRIPTS_DIR) / youtuber
     if not transcripts_dir.exists():
         return {youtuber: []}
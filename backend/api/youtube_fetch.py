@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from youtube_transcript_api import YouTubeTranscriptApi
 import yt_dlp
 import random
@@ -9,7 +11,10 @@ import logging
 import os
 import json
 import pathlib
+import time
 from config import settings
+from backend.core import channel_cache, corpus_store, sentence_index, transcript_index
+from backend.core.retry_queue import RetryQueue
 
 router = APIRouter()
 
@@ -22,73 +27,138 @@ class TranscriptResponse(BaseModel):
     language: Optional[str]
     is_generated: Optional[bool] = None
     error: Optional[str] = None
+    attempts: Optional[int] = None
+    next_retry_at: Optional[float] = None
+
+class BatchIngestRequest(BaseModel):
+    channels: List[str] = []
+    video_ids: List[str] = []
+    num_videos: int = 3
+    max_concurrency: int = settings.INGEST_MAX_CONCURRENCY
 
 def sanitize_filename(name):
     # Remove or replace characters not allowed in filenames
     return re.sub(r'[^\w\-_\. ]', '_', name)
 
-@router.get("/api/channel_videos", response_model=List[str])
-def get_channel_video_ids(youtuber: str = Query(...), num_videos: int = Query(3)):
-    logger.info(f"Fetching channel videos for: {youtuber}, num_videos={num_videos}")
-    ydl_opts = {'extract_flat': True, 'quiet': True, 'skip_download': True}
-    channel_url = youtuber if youtuber.startswith('http') else f"https://www.youtube.com/{youtuber}/videos"
+def _save_transcript(transcript_path, data):
+    # Write the transcript JSON and point the video_id index at it
+    with open(transcript_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    transcript_index.record(data["video_id"], transcript_path, data.get("channel_name"), data.get("video_title"), bool(data.get("transcript")))
+    channel = pathlib.Path(transcript_path).parent.name
+    if corpus_store.enabled():
+        corpus_store.put(channel, data)
+    if data.get("transcript"):
+        sentence_index.add_transcript(channel, data["video_id"], data["transcript"])
+
+def _list_channel_videos(channel_url, start, end):
+    """
+    Enumerates playlist entries start..end (1-based, inclusive) of a channel tab, newest first.
+    Returns (video_ids, exhausted) where exhausted means the channel has no further entries.
+    """
+    ydl_opts = {
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True,
+        'playliststart': start,
+        'playlistend': end,
+        'quiet': True,
+        'skip_download': True
+    }
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(channel_url, download=False)
-        entries = info.get('entries', [])
-        # Only keep valid video IDs (length 11) and not shorts
-        video_ids = [
-            e['id'] for e in entries
-            if 'id' in e and isinstance(e['id'], str) and len(e['id']) == 11
-            # and e.get('availability') in ['public', 'unlisted']
-            and (
-                ('url' in e and '/shorts/' not in str(e['url']))
-                or ('url' not in e and '_type' in e and e['_type'] == 'url')  # fallback for some playlist entries
-            )
-        ]
+        entries = list(info.get('entries') or [])
+    # Only keep valid video IDs (length 11) and not shorts
+    video_ids = [
+        e['id'] for e in entries
+        if 'id' in e and isinstance(e['id'], str) and len(e['id']) == 11
+        # and e.get('availability') in ['public', 'unlisted']
+        and (
+            ('url' in e and '/shorts/' not in str(e['url']))
+            or ('url' not in e and '_type' in e and e['_type'] == 'url')  # fallback for some playlist entries
+        )
+    ]
+    return video_ids, len(entries) < end - start + 1
+
+def _listing_pages(channel_url, first_page):
+    """
+    Yields (video_ids so far, exhausted), doubling the window up to CHANNEL_LISTING_MAX_SCAN entries. Each
+    pass only asks yt-dlp for the entries after the previous window (playliststart), so listing N entries
+    walks each of them once.
+    """
+    video_ids = []
+    scanned = 0
+    limit = min(first_page, settings.CHANNEL_LISTING_MAX_SCAN)
+    while True:
+        page, exhausted = _list_channel_videos(channel_url, scanned + 1, limit)
+        # An upload between passes shifts entries down by one; skip IDs the previous page already had
+        video_ids.extend(v for v in page if v not in video_ids)
+        yield video_ids, exhausted
+        if exhausted or limit >= settings.CHANNEL_LISTING_MAX_SCAN:
+            return
+        scanned = limit
+        limit = min(limit * 2, settings.CHANNEL_LISTING_MAX_SCAN)
+
+def _fetch_latest(channel_url, num_videos):
+    # Walk only as far as needed, widening the window when filtering drops entries
+    for video_ids, exhausted in _listing_pages(channel_url, max(num_videos, settings.CHANNEL_LISTING_PAGE_SIZE)):
+        if len(video_ids) >= num_videos:
+            break
+    return video_ids, exhausted
+
+def _fetch_newer(channel_url, known_ids):
+    """
+    Finds uploads newer than the newest known video ID and returns the merged listing,
+    or None if the known head could not be found within CHANNEL_LISTING_MAX_SCAN entries.
+    """
+    newest_known = known_ids[0]
+    for video_ids, _exhausted in _listing_pages(channel_url, settings.CHANNEL_LISTING_PAGE_SIZE):
+        if newest_known in video_ids:
+            new_ids = video_ids[:video_ids.index(newest_known)]
+            return new_ids + [v for v in known_ids if v not in new_ids]
+    return None
+
+def normalize_channel_url(youtuber):
+    """
+    The videos-tab URL for a handle ("@name") or a channel URL, so spellings of one channel share a cache entry.
+    """
+    youtuber = youtuber.strip().rstrip('/')
+    if not youtuber.startswith('http'):
+        return f"https://www.youtube.com/{youtuber}/videos"
+    url = re.sub(r'^https?://(?:www\.|m\.)?youtube\.com', 'https://www.youtube.com', youtuber)
+    if re.fullmatch(r'https://www\.youtube\.com/(@[^/]+|(?:channel|c|user)/[^/]+)', url):
+        url += "/videos"
+    return url
+
+@router.get("/api/channel_videos", response_model=List[str])
+def get_channel_video_ids(youtuber: str = Query(...), num_videos: int = Query(3), refresh: str = Query("auto")):
+    # refresh: "auto" serves from cache within the TTL, "incremental" only looks for newer uploads, "full" re-lists
+    logger.info(f"Fetching channel videos for: {youtuber}, num_videos={num_videos}, refresh={refresh}")
+    channel_url = normalize_channel_url(youtuber)
+    cached = channel_cache.load(channel_url) if refresh != "full" else None
+    enough_cached = cached is not None and (len(cached["video_ids"]) >= num_videos or cached.get("exhausted"))
+    if refresh == "auto" and enough_cached and channel_cache.is_fresh(cached):
+        logger.info(f"Channel listing cache hit for {youtuber}")
+        return cached["video_ids"][:num_videos]
+    video_ids = None
+    exhausted = False
+    if cached and cached["video_ids"] and enough_cached:
+        video_ids = _fetch_newer(channel_url, cached["video_ids"])
+        if video_ids is not None:
+            exhausted = cached.get("exhausted", False)
+            logger.info(f"Incremental refresh for {youtuber}: {len(video_ids) - len(cached['video_ids'])} new videos")
+    if video_ids is None:
+        video_ids, exhausted = _fetch_latest(channel_url, num_videos)
     if not video_ids:
         logger.warning(f"No valid videos found for channel: {youtuber}")
         return []
+    channel_cache.save(channel_url, video_ids, exhausted)
     # Return the latest N videos (first N in the list)
     return video_ids[:num_videos]
 
-@router.get("/api/transcript", response_model=TranscriptResponse)
-def get_transcript(video_id: str = Query(...)):
-    video_url = f"https://youtu.be/{video_id}"
-    logger.info(f"Fetching transcript for video_id: {video_id}")
-    # Try to load from local cache first
-    transcript_dir = pathlib.Path(settings.TRANSCRIPTS_DIR)
-    transcript_dir.mkdir(exist_ok=True)
-    meta_info = None
-    # Try to get channel name and video title using yt-dlp
-    try:
-        with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            channel_name = sanitize_filename(info.get('channel', 'unknown_channel'))
-            video_title = sanitize_filename(info.get('title', 'unknown_title'))
-            meta_info = {
-                "channel_name": channel_name,
-                "video_title": video_title,
-                "video_url": video_url,
-                "video_id": video_id
-            }
-    except Exception as e:
-        logger.warning(f"Could not fetch video/channel info for {video_id}: {e}")
-        channel_name = 'unknown_channel'
-        video_title = 'unknown_title'
-        meta_info = {
-            "channel_name": channel_name,
-            "video_title": video_title,
-            "video_url": video_url,
-            "video_id": video_id
-        }
-    channel_dir = transcript_dir / meta_info["channel_name"]
-    channel_dir.mkdir(exist_ok=True)
-    transcript_path = channel_dir / f"{meta_info['video_title']}_{video_id}.json"
-    if transcript_path.exists():
-        logger.info(f"Transcript already exists locally: {transcript_path}")
-        with open(transcript_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return TranscriptResponse(**data)
+def _fetch_transcript_data(video_id, meta_info):
+    """
+    Fetches a transcript from YouTube (English first, then any language) and returns the record to store.
+    """
     try:
         # Try English first
         try:
@@ -102,9 +172,7 @@ def get_transcript(video_id: str = Query(...)):
                 "is_generated": False,
                 "error": None
             }
-            with open(transcript_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            return TranscriptResponse(**data)
+            return data
         except Exception as e_en:
             logger.warning(f"English transcript not found for {video_id}: {e_en}")
             # Try any available language
@@ -127,9 +195,7 @@ def get_transcript(video_id: str = Query(...)):
                             "error": None
                         }
                         # If not English, just save the transcript as-is; transliteration is handled by a separate script
-                        with open(transcript_path, 'w', encoding='utf-8') as f:
-                            json.dump(data, f, ensure_ascii=False, indent=2)
-                        return TranscriptResponse(**data)
+                        return data
                     except Exception as e_any:
                         logger.warning(f"Failed to fetch transcript in {t.language_code} for {video_id}: {e_any}")
                 logger.error(f"No transcript available for {video_id} in any language.")
@@ -140,9 +206,7 @@ def get_transcript(video_id: str = Query(...)):
                     "is_generated": None,
                     "error": "No transcript available in any language."
                 }
-                with open(transcript_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                return TranscriptResponse(**data)
+                return data
             except Exception as e_list:
                 logger.error(f"Transcript not available for {video_id}: {e_list}")
                 data = {
@@ -152,9 +216,7 @@ def get_transcript(video_id: str = Query(...)):
                     "is_generated": None,
                     "error": str(e_list)
                 }
-                with open(transcript_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                return TranscriptResponse(**data)
+                return data
     except Exception as e:
         logger.error(f"Transcript not available for {video_id}: {e}")
         data = {
@@ -164,9 +226,124 @@ def get_transcript(video_id: str = Query(...)):
             "is_generated": None,
             "error": str(e)
         }
-        with open(transcript_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return TranscriptResponse(**data)
+        return data
+
+def _failure_fields(previous=None):
+    # Exponential backoff for failed fetches. After TRANSCRIPT_RETRY_MAX_ATTEMPTS the entry is given up and
+    # served for NEGATIVE_CACHE_TTL_SECONDS; the retry a read schedules once it expires starts a new series
+    attempts = (previous or {}).get("attempts") or 0
+    attempts = 1 if attempts >= settings.TRANSCRIPT_RETRY_MAX_ATTEMPTS else attempts + 1
+    if attempts >= settings.TRANSCRIPT_RETRY_MAX_ATTEMPTS:
+        delay = settings.NEGATIVE_CACHE_TTL_SECONDS
+    else:
+        delay = min(settings.TRANSCRIPT_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.NEGATIVE_CACHE_TTL_SECONDS)
+    now = time.time()
+    return {"attempts": attempts, "last_attempt_at": now, "next_retry_at": now + delay}
+
+def _store_result(transcript_path, data, previous=None):
+    if data.get("transcript"):
+        data.update({"attempts": None, "last_attempt_at": None, "next_retry_at": None})
+    else:
+        data.update(_failure_fields(previous))
+    _save_transcript(transcript_path, data)
+    if not data.get("transcript") and data["attempts"] < settings.TRANSCRIPT_RETRY_MAX_ATTEMPTS:
+        retry_queue.schedule(data["video_id"], data["next_retry_at"])
+    return data
+
+def _serve_cached(data):
+    # Negative results are served until they expire; the retry itself runs in the background
+    if not data.get("transcript"):
+        next_retry_at = data.get("next_retry_at") or 0
+        if time.time() >= next_retry_at:
+            logger.info(f"Negative cache entry expired for {data.get('video_id')}, scheduling background retry")
+            retry_queue.schedule(data["video_id"])
+    return TranscriptResponse(**data)
+
+def refresh_transcript(video_id):
+    """
+    Re-attempts a previously failed transcript fetch. Used by the background retry queue.
+    """
+    cached = transcript_index.lookup(video_id)
+    if not cached:
+        return
+    with open(cached["path"], 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    if previous.get("transcript"):
+        return
+    logger.info(f"Retrying transcript fetch for {video_id} (attempt {(previous.get('attempts') or 0) + 1})")
+    meta_info = {k: previous.get(k) for k in ("channel_name", "video_title", "video_url", "video_id")}
+    data = _fetch_transcript_data(video_id, meta_info)
+    _store_result(cached["path"], data, previous)
+    if data.get("transcript"):
+        logger.info(f"Transcript for {video_id} became available on retry")
+
+retry_queue = RetryQueue(refresh_transcript, name="transcript_retry")
+
+def schedule_pending_retries():
+    """
+    Re-queues stored negative results, e.g. on server startup.
+    """
+    count = 0
+    for entry in transcript_index.list_missing():
+        try:
+            with open(entry["path"], 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read negative cache entry {entry['path']}: {e}")
+            continue
+        if (data.get("attempts") or 0) < settings.TRANSCRIPT_RETRY_MAX_ATTEMPTS:
+            retry_queue.schedule(entry["video_id"], data.get("next_retry_at"))
+            count += 1
+    logger.info(f"Scheduled {count} transcript retries")
+    return count
+
+@router.get("/api/transcript", response_model=TranscriptResponse)
+def get_transcript(video_id: str = Query(...)):
+    video_url = f"https://youtu.be/{video_id}"
+    logger.info(f"Fetching transcript for video_id: {video_id}")
+    # Try to load from local cache first; the index avoids a yt-dlp metadata call on hits
+    cached = transcript_index.lookup(video_id)
+    if cached:
+        logger.info(f"Transcript found in index: {cached['path']}")
+        with open(cached["path"], 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return _serve_cached(data)
+    transcript_dir = pathlib.Path(settings.TRANSCRIPTS_DIR)
+    transcript_dir.mkdir(exist_ok=True)
+    meta_info = None
+    # Try to get channel name and video title using yt-dlp
+    try:
+        with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+            info = ydl.extract_info(video_url, download=False)
+            channel_name = sanitize_filename(info.get('channel', 'unknown_channel'))
+            video_title = sanitize_filename(info.get('title', 'unknown_title'))
+            meta_info = {
+                "channel_name": channel_name,
+                "video_title": video_title,
+                "video_url": video_url,
+                "video_id": video_id
+            }
+    except Exception as e:
+        logger.warning(f"Could not fetch video/channel info for {video_id}: {e}")
+        channel_name = 'unknown_channel'
+        video_title = 'unknown_title'
+        meta_info = {
+            "channel_name": channel_name,
+            "video_title": video_title,
+            "video_url": video_url,
+            "video_id": video_id
+        }
+    channel_dir = transcript_dir / meta_info["channel_name"]
+    channel_dir.mkdir(exist_ok=True)
+    transcript_path = channel_dir / f"{meta_info['video_title']}_{video_id}.json"
+    if transcript_path.exists():
+        logger.info(f"Transcript already exists locally: {transcript_path}")
+        with open(transcript_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        transcript_index.record(video_id, transcript_path, meta_info["channel_name"], meta_info["video_title"], bool(data.get("transcript")))
+        return _serve_cached(data)
+    data = _fetch_transcript_data(video_id, meta_info)
+    return TranscriptResponse(**_store_result(transcript_path, data))
 
 @router.get("/api/transcript_from_url", response_model=TranscriptResponse)
 def get_transcript_from_url(video_url: str = Query(...)):
@@ -176,4 +353,51 @@ def get_transcript_from_url(video_url: str = Query(...)):
         logger.error(f"Invalid YouTube video URL: {video_url}")
         return TranscriptResponse(video_id="", video_url=video_url, transcript=None, language=None, error="Invalid YouTube video URL.")
     video_id = match.group(1)
-    return get_transcript(video_id) 
\ No newline at end of file
+    return get_transcript(video_id)
+
+@router.post("/api/batch_ingest")
+def batch_ingest(req: BatchIngestRequest):
+    """
+    Resolves channels to video IDs and fetches transcripts concurrently.
+    Streams one JSON line per event (NDJSON) so clients see each video as soon as it finishes.
+    """
+    max_workers = max(1, min(req.max_concurrency, settings.INGEST_MAX_CONCURRENCY))
+    logger.info(f"Batch ingest: channels={req.channels}, video_ids={len(req.video_ids)}, num_videos={req.num_videos}, max_concurrency={max_workers}")
+
+    def events():
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # Resolve channel listings first, in parallel
+            video_ids = list(dict.fromkeys(req.video_ids))
+            channels = list(dict.fromkeys(normalize_channel_url(ch) for ch in req.channels))
+            channel_futures = {pool.submit(get_channel_video_ids, ch, req.num_videos, "auto"): ch for ch in channels}
+            for fut in as_completed(channel_futures):
+                channel = channel_futures[fut]
+                try:
+                    ids = fut.result()
+                    yield json.dumps({"event": "channel", "channel": channel, "video_ids": ids}) + "\n"
+                except Exception as e:
+                    logger.error(f"Failed to list videos for channel {channel}: {e}")
+                    ids = []
+                    yield json.dumps({"event": "channel", "channel": channel, "video_ids": [], "error": str(e)}) + "\n"
+                video_ids.extend(v for v in ids if v not in video_ids)
+            total = len(video_ids)
+            yield json.dumps({"event": "start", "total": total}) + "\n"
+            # Fetch transcripts, reporting each one as it completes
+            video_futures = {pool.submit(get_transcript, vid): vid for vid in video_ids}
+            completed = 0
+            failed = 0
+            for fut in as_completed(video_futures):
+                vid = video_futures[fut]
+                completed += 1
+                try:
+                    result = fut.result().model_dump()
+                except Exception as e:
+                    logger.error(f"Batch ingest failed for {vid}: {e}")
+                    result = TranscriptResponse(video_id=vid, video_url=f"https://youtu.be/{vid}", transcript=None, language=None, error=str(e)).model_dump()
+                if not result.get("transcript"):
+                    failed += 1
+                yield json.dumps({"event": "video", "video_id": vid, "completed": completed, "total": total, "result": result}, ensure_ascii=False) + "\n"
+            logger.info(f"Batch ingest finished: {completed - failed}/{total} transcripts fetched")
+            yield json.dumps({"event": "done", "total": total, "succeeded": completed - failed, "failed": failed}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
@@ -0,0 +1,280 @@
+import contextlib
+import io
+import logging
+import os
+import pathlib
+import struct
+import wave
+import numpy as np
+from pydub import AudioSegment
+
+logger = logging.getLogger("audio_assembly")
+
+# Narration assembly on NumPy buffers: every line becomes a mono float32 array, the episode is written
+# into one preallocated array (lines and pauses placed by offset), and it is encoded once at the end.
+
+PAUSE_SECONDS = 0.4
+
+def to_float(samples):
+    """
+    Mono float32 in [-1, 1] from a float waveform or int16 samples.
+    """
+    samples = np.asarray(samples)
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / 32768.0
+    return samples.astype(np.float32, copy=False)
+
+def resample(samples, from_rate, to_rate):
+    # Linear interpolation onto the new sample grid
+    if from_rate == to_rate or len(samples) == 0:
+        return samples
+    n_out = int(round(len(samples) * to_rate / from_rate))
+    positions = np.arange(n_out, dtype=np.float64) * (from_rate / to_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+def speed_up(samples, speed=1.2):
+    """
+    Plays the line speed times faster (pitch rises with it), like replaying at a higher frame rate.
+    """
+    return resample(samples, speed, 1.0) if speed != 1.0 else samples
+
+def decode(data, audio_format):
+    """
+    Decodes encoded audio bytes in memory. Returns (mono float32 samples, sample_rate).
+    """
+    segment = AudioSegment.from_file(io.BytesIO(data), format=audio_format).set_channels(1).set_sample_width(2)
+    return to_float(np.frombuffer(segment.raw_data, dtype=np.int16)), segment.frame_rate
+
+def pause(sample_rate, seconds=PAUSE_SECONDS):
+    return np.zeros(int(sample_rate * seconds), dtype=np.float32)
+
+def assemble(segments, sample_rate, pause_seconds=PAUSE_SECONDS):
+    """
+    Concatenates line waveforms, each followed by a pause, into one preallocated buffer.
+    """
+    gap = int(sample_rate * pause_seconds)
+    output = np.zeros(sum(len(s) for s in segments) + gap * len(segments), dtype=np.float32)
+    offset = 0
+    for samples in segments:
+        output[offset:offset + len(samples)] = samples
+        offset += len(samples) + gap
+    return output
+
+def to_pcm16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+# Streaming WAV: the length fields are unknown while lines are still being synthesized, so they carry the
+# maximum value and players read PCM until the connection closes.
+STREAM_SIZE = 0xFFFFFFFF
+
+def wav_stream_header(sample_rate):
+    """
+    44-byte header for an open-ended mono 16-bit PCM stream.
+    """
+    return (
+        b"RIFF" + struct.pack("<I", STREAM_SIZE) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+        + b"data" + struct.pack("<I", STREAM_SIZE)
+    )
+
+def stream_chunk(samples, sample_rate, pause_seconds=PAUSE_SECONDS):
+    """
+    PCM bytes for one line followed by its pause, matching what assemble() places in the saved file.
+    """
+    return to_pcm16(samples).tobytes() + to_pcm16(pause(sample_rate, pause_seconds)).tobytes()
+
+@contextlib.contextmanager
+def output_file(output_path):
+    """
+    Yields a .part path to write to; the file appears at output_path only when the block succeeded.
+    """
+    output_path = pathlib.Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + ".part")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def encode(samples, sample_rate, output_path, output_format):
+    """
+    Encodes the finished episode once. WAV is written directly; other formats go through pydub/ffmpeg.
+    """
+    pcm = to_pcm16(samples)
+    with output_file(output_path) as tmp_path:
+        if output_format == "wav":
+            with wave.open(str(tmp_path), "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(sample_rate)
+                f.writeframes(pcm.tobytes())
+        else:
+            AudioSegment(pcm.tobytes(), frame_rate=sample_rate, sample_width=2, channels=1).export(tmp_path, format=output_format)
+    return pathlib.Path(output_path)
+
+class EpisodeWriter:
+    """
+    Writes an episode line by line into a .part file that replaces output_path on a clean exit:
+        with WavWriter(path) as writer:
+            writer.add(samples, sample_rate)
+    Subclasses implement _open() and add(); lines counts what was added.
+    """
+
+    def __init__(self, output_path, pause_seconds=PAUSE_SECONDS):
+        self.output_path = pathlib.Path(output_path)
+        self.tmp_path = self.output_path.with_name(self.output_path.name + ".part")
+        self.pause_seconds = pause_seconds
+        self.lines = 0
+
+    def __enter__(self):
+        self._open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._close()
+            if exc_type is None and self.lines:
+                os.replace(self.tmp_path, self.output_path)
+        finally:
+            if self.tmp_path.exists():
+                self.tmp_path.unlink()
+        return False
+
+    def _open(self):
+        pass
+
+    def _close(self):
+        pass
+
+class WavWriter(EpisodeWriter):
+    """
+    WAV written as lines arrive, so memory stays at one line whatever the episode length.
+    The file's rate is the first line's; later lines are resampled to it.
+    """
+
+    def _open(self):
+        self._file = wave.open(str(self.tmp_path), "wb")
+        self._file.setnchannels(1)
+        self._file.setsampwidth(2)
+        self.sample_rate = None
+
+    def add(self, samples, sample_rate):
+        if self.sample_rate is None:
+            self.sample_rate = sample_rate
+            self._file.setframerate(sample_rate)
+        self._file.writeframes(stream_chunk(resample(samples, sample_rate, self.sample_rate), self.sample_rate, self.pause_seconds))
+        self.lines += 1
+
+    def _close(self):
+        if self.sample_rate is None:
+            self._file.setframerate(24000)
+        self._file.close()
+
+class BufferedWriter(EpisodeWriter):
+    """
+    Formats without an incremental writer (ogg, flac, ...): lines are kept and encoded once on close.
+    """
+
+    def __init__(self, output_path, output_format, pause_seconds=PAUSE_SECONDS):
+        super().__init__(output_path, pause_seconds)
+        self.output_format = output_format
+        self._segments = []
+        self.sample_rate = None
+
+    def add(self, samples, sample_rate):
+        if self.sample_rate is None:
+            self.sample_rate = sample_rate
+        self._segments.append(resample(samples, sample_rate, self.sample_rate))
+        self.lines += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and self._segments:
+            encode(assemble(self._segments, self.sample_rate, self.pause_seconds), self.sample_rate, self.output_path, self.output_format)
+        return False
+
+# MPEG audio Layer III frame headers, for joining mp3 lines without decoding them
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+def mp3_frame_info(header):
+    """
+    Parses a 4-byte Layer III frame header. Returns {"version", "sample_rate", "frame_bytes", "samples", "mode"}
+    or None if the bytes are not one.
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = {3: 1, 2: 2, 0: 2.5}.get((header[1] >> 3) & 0x03)
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version is None or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = MP3_BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    coefficient = 144 if version == 1 else 72
+    return {
+        "version": version,
+        "sample_rate": sample_rate,
+        "frame_bytes": coefficient * bitrate // sample_rate + padding,
+        "samples": 1152 if version == 1 else 576,
+        "mode": header[3] >> 6
+    }
+
+def mp3_payload(data):
+    """
+    The MPEG frames of an mp3 file: ID3v2/ID3v1 tags and a leading Xing/Info/VBRI frame are dropped, since
+    mid-file they would be played as noise or make players read the first line's length as the episode's.
+    """
+    start, end = 0, len(data)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    info = mp3_frame_info(data[start:start + 4])
+    if info and any(tag in data[start:start + min(info["frame_bytes"], 64)] for tag in (b"Xing", b"Info", b"VBRI")):
+        start += info["frame_bytes"]
+    return data[start:end]
+
+def mp3_silence(header, seconds=PAUSE_SECONDS):
+    """
+    Silent frames matching a line's frame header: all-zero side info and main data decode to silence,
+    so pauses can be inserted between mp3 lines without an encoder.
+    """
+    header = bytearray(header[:4])
+    header[1] |= 0x01  # no CRC
+    header[2] &= ~0x02 & 0xFF  # no padding
+    info = mp3_frame_info(bytes(header))
+    frame = bytes(header) + bytes(info["frame_bytes"] - 4)
+    return frame * int(np.ceil(seconds * info["sample_rate"] / info["samples"]))
+
+class Mp3PassthroughWriter(EpisodeWriter):
+    """
+    Joins mp3 lines (encoded bytes) frame for frame, with silent frames for the pauses, without decoding
+    or re-encoding anything. Each line is written as it arrives, so memory stays at one line.
+    """
+
+    def _open(self):
+        self._file = open(self.tmp_path, "wb")
+        self._first = None
+
+    def add(self, data):
+        frames = mp3_payload(data)
+        info = mp3_frame_info(frames[:4])
+        if info is None:
+            raise ValueError("Line audio is not MPEG Layer III")
+        if self._first is None:
+            self._first = info
+        elif (info["sample_rate"], info["mode"]) != (self._first["sample_rate"], self._first["mode"]):
+            logger.warning(f"Joining mp3 lines with different formats ({info['sample_rate']} Hz vs {self._first['sample_rate']} Hz)")
+        self._file.write(frames)
+        self._file.write(mp3_silence(frames[:4], self.pause_seconds))
+        self.lines += 1
+
+    def _close(self):
+        self._file.close()
@@ -0,0 +1,21 @@
+import numpy as np
+from config import settings
+from backend.core.disk_cache import DiskLRUCache, cache_key
+
+# Per-line synthesized audio shared by both TTS engines, so re-narrating an edited script only
+# synthesizes the lines that changed. ElevenLabs entries are the encoded bytes the API returned;
+# Bark entries are the float32 waveform.
+audio_cache = DiskLRUCache(settings.AUDIO_CACHE_DB, settings.AUDIO_CACHE_MAX_BYTES)
+
+def line_key(engine, voice, text, voice_settings):
+    """
+    Key for one line: engine, voice or preset, the cleaned text and every setting that changes the audio.
+    """
+    return cache_key("tts", engine, voice, text, voice_settings)
+
+def get_waveform(key):
+    data = audio_cache.get(key)
+    return np.frombuffer(data, dtype=np.float32) if data is not None else None
+
+def put_waveform(key, waveform):
+    audio_cache.put(key, np.asarray(waveform, dtype=np.float32).tobytes())
@@ -0,0 +1,184 @@
+import gc
+import logging
+import os
+import threading
+import time
+from config import settings
+
+logger = logging.getLogger("bark_models")
+
+# Bark keeps its loaded models in the module-level dict bark.generation.models and loads them lazily on the
+# first generation. This manager owns that residency: it loads (and warms up) the models on demand or at
+# startup, keeps voice presets in memory, reports what is resident, and can drop everything after an idle
+# period. Bark's generation state is global, so all synthesis in this process goes through one lock.
+
+# "draft" trades quality for speed on CPU: small models, int8 dynamic quantization of their Linear layers,
+# KV caching, and decoding straight from the coarse codebooks without the fine stage. Sampling
+# temperatures stay at Bark's defaults (0.7); lowering them does not make generation faster.
+# "fast" picks the staged generation path (_generate_fast) instead of bark.generate_audio.
+TIERS = {
+    "standard": {"use_small": False, "quantize": False, "fast": False},
+    "draft": {"use_small": True, "quantize": True, "fast": True, "skip_fine": True},
+}
+
+class BarkModelManager:
+
+    def __init__(self, idle_unload_seconds=None):
+        self.idle_unload_seconds = settings.BARK_IDLE_UNLOAD_SECONDS if idle_unload_seconds is None else idle_unload_seconds
+        self._lock = threading.RLock()
+        self._residency = {tier: {} for tier in TIERS}  # tier -> Bark's models dict for that tier
+        self._loaded = {}  # tier -> {"loaded_at", "load_seconds", "warm", "quantized"}
+        self._presets = {}
+        self.last_used = None
+        self._monitor = None
+
+    def _activate(self, tier):
+        # Point Bark's globals at this tier's models; callers hold the lock
+        from bark import generation
+        generation.models = self._residency[tier]
+
+    def load(self, tier="standard", warm_up=False):
+        """
+        Loads a tier's models if they are not resident yet; warm_up runs one short generation so
+        lazy initialisation (kernels, allocator pools) happens now rather than on the first request.
+        """
+        with self._lock:
+            if tier not in self._loaded:
+                from bark import generation
+                import torch
+                started = time.time()
+                self._activate(tier)
+                small = TIERS[tier]["use_small"]
+                generation.preload_models(text_use_small=small, coarse_use_small=small, fine_use_small=small)
+                device = torch.cuda.get_device_name(0) if torch.cuda.is_available() else "CPU"
+                quantized = TIERS[tier]["quantize"] and _quantize(self._residency[tier])
+                self._loaded[tier] = {"loaded_at": time.time(), "load_seconds": time.time() - started, "warm": False, "quantized": quantized}
+                logger.info(f"Loaded Bark {tier} models on {device} in {self._loaded[tier]['load_seconds']:.1f}s (int8: {quantized})")
+            if warm_up and not self._loaded[tier]["warm"]:
+                started = time.time()
+                self.generate(settings.BARK_WARMUP_TEXT, settings.BARK_DEFAULT_PRESET, tier)
+                self._loaded[tier]["warm"] = True
+                logger.info(f"Warmed up Bark {tier} models in {time.time() - started:.1f}s")
+            self.last_used = time.time()
+
+    def preset(self, name):
+        """
+        Voice preset arrays, resolved from disk once and then served from memory.
+        """
+        with self._lock:
+            if name not in self._presets:
+                from bark.generation import _load_history_prompt
+                self._presets[name] = _load_history_prompt(name)
+            return self._presets[name]
+
+    def generate(self, text, preset, tier="standard"):
+        """
+        Synthesizes one line; returns a float waveform at Bark's SAMPLE_RATE.
+        """
+        from bark import generate_audio
+        with self._lock:
+            self.load(tier)
+            self._activate(tier)
+            if TIERS[tier]["fast"]:
+                audio = _generate_fast(text, self.preset(preset), TIERS[tier])
+            else:
+                audio = generate_audio(text, history_prompt=self.preset(preset), silent=True)
+            self.last_used = time.time()
+            return audio
+
+    def unload(self, tier=None):
+        """
+        Drops the models of one tier (or all tiers) and returns their memory.
+        """
+        with self._lock:
+            for name in [tier] if tier else list(self._loaded):
+                self._residency[name].clear()
+                self._loaded.pop(name, None)
+                logger.info(f"Unloaded Bark {name} models")
+            gc.collect()
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except ImportError:
+                pass
+
+    def status(self):
+        with self._lock:
+            tiers = {}
+            for tier in TIERS:
+                info = dict(self._loaded.get(tier) or {})
+                info["loaded"] = tier in self._loaded
+                info["parameter_bytes"] = _parameter_bytes(self._residency[tier])
+                tiers[tier] = info
+            return {
+                "tiers": tiers,
+                "presets_cached": sorted(self._presets),
+                "last_used": self.last_used,
+                "idle_unload_seconds": self.idle_unload_seconds,
+                "rss_bytes": _rss_bytes(),
+                "cuda_allocated_bytes": _cuda_allocated_bytes()
+            }
+
+    def start_idle_monitor(self):
+        if not self.idle_unload_seconds or self._monitor is not None:
+            return
+        self._monitor = threading.Thread(target=self._watch_idle, name="bark_idle_unload", daemon=True)
+        self._monitor.start()
+
+    def _watch_idle(self):
+        while True:
+            time.sleep(min(self.idle_unload_seconds, 30))
+            with self._lock:
+                if self._loaded and self.last_used and time.time() - self.last_used > self.idle_unload_seconds:
+                    logger.info(f"Bark idle for {self.idle_unload_seconds}s, unloading models")
+                    self.unload()
+
+def _generate_fast(text, history_prompt, config):
+    from bark.generation import codec_decode, generate_coarse, generate_fine, generate_text_semantic
+    semantic = generate_text_semantic(text, history_prompt=history_prompt, silent=True, use_kv_caching=True)
+    coarse = generate_coarse(semantic, history_prompt=history_prompt, silent=True, use_kv_caching=True)
+    # EnCodec decodes from any prefix of its codebooks, so the two coarse ones are enough for a rough listen
+    tokens = coarse if config["skip_fine"] else generate_fine(coarse, history_prompt=history_prompt, temp=0.5, silent=True)
+    return codec_decode(tokens)
+
+def _quantize(models):
+    """
+    Dynamic int8 quantization of the GPT models' Linear layers, in place in Bark's models dict.
+    Only on CPU and only where torch ships a quantized engine; returns whether it was applied.
+    """
+    import torch
+    if torch.cuda.is_available() or all(engine == "none" for engine in torch.backends.quantized.supported_engines):
+        return False
+    for key in ("text", "coarse", "fine"):
+        if key == "text":
+            models[key]["model"] = torch.quantization.quantize_dynamic(models[key]["model"], {torch.nn.Linear}, dtype=torch.qint8)
+        elif key in models:
+            models[key] = torch.quantization.quantize_dynamic(models[key], {torch.nn.Linear}, dtype=torch.qint8)
+    return True
+
+def _parameter_bytes(models):
+    total = 0
+    for model in models.values():
+        if isinstance(model, dict):
+            model = model.get("model")
+        if hasattr(model, "parameters"):
+            total += sum(p.numel() * p.element_size() for p in model.parameters())
+    return total
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def _cuda_allocated_bytes():
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch.cuda.memory_allocated() if torch.cuda.is_available() else None
+
+# Shared by the Bark narration endpoint and the startup preload
+bark_models = BarkModelManager()
@@ -0,0 +1,102 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import settings
+from backend.core.bark_models import TIERS
+
+logger = logging.getLogger("bark_pool")
+
+# Parallel Bark synthesis: lines are dispatched to worker processes, each with its own resident models
+# (via its own BarkModelManager) and a pinned torch thread count, so N workers use N x threads cores
+# without oversubscribing them. Workers are started with "spawn" so they never inherit torch or CUDA
+# state from the API process.
+
+def _init_worker(torch_threads, tier):
+    import torch
+    torch.set_num_threads(torch_threads)
+    from backend.core.bark_models import bark_models
+    bark_models.load(tier)
+    logger.info(f"Bark worker {os.getpid()} ready with {torch_threads} torch threads")
+
+def _synthesize(text, preset, tier):
+    from backend.core.bark_models import bark_models
+    return bark_models.generate(text, preset, tier)
+
+class BarkProcessPool:
+    """
+    Worker processes for one quality tier, so each tier keeps its own models resident.
+    """
+
+    def __init__(self, tier="standard", workers=None, threads_per_worker=None):
+        self.tier = tier
+        self.workers = settings.BARK_WORKERS if workers is None else workers
+        self.threads_per_worker = threads_per_worker or settings.BARK_THREADS_PER_WORKER or max(1, (os.cpu_count() or 1) // max(self.workers, 1))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 1
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.threads_per_worker, self.tier)
+                )
+                logger.info(f"Started Bark {self.tier} process pool: {self.workers} workers x {self.threads_per_worker} threads")
+            return self._executor
+
+    def synthesize(self, items, progress=None):
+        """
+        Synthesizes [(text, preset)] across the pool and returns the waveforms in input order.
+        progress(done, total) is called as lines finish; if it raises, pending lines are cancelled.
+        """
+        executor = self._get_executor()
+        futures = {executor.submit(_synthesize, text, preset, self.tier): i for i, (text, preset) in enumerate(items)}
+        results = [None] * len(items)
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if progress:
+                    progress(done, len(items))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return results
+
+    def iter_synthesize(self, items):
+        """
+        Like synthesize() but yields each waveform in input order as soon as it and all earlier lines are done,
+        while later lines keep running. Closing the generator cancels the lines not yet started.
+        """
+        executor = self._get_executor()
+        futures = [executor.submit(_synthesize, text, preset, self.tier) for text, preset in items]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def status(self):
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "started": self._executor is not None
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+# Shared by the Bark narration endpoint, one per quality tier; processes start on first use
+bark_pools = {tier: BarkProcessPool(tier) for tier in TIERS}
@@ -0,0 +1,51 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import time
+from config import settings
+
+logger = logging.getLogger("channel_cache")
+
+def _cache_path(channel_url):
+    key = hashlib.sha1(channel_url.encode("utf-8")).hexdigest()[:16]
+    return pathlib.Path(settings.CHANNEL_CACHE_DIR) / f"{key}.json"
+
+def load(channel_url):
+    """
+    Returns the cached listing for a channel URL ({"video_ids", "fetched_at", "exhausted"}) or None.
+    """
+    path = _cache_path(channel_url)
+    if not path.exists():
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable channel cache {path}: {e}")
+        return None
+
+def save(channel_url, video_ids, exhausted):
+    path = _cache_path(channel_url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "channel_url": channel_url,
+        "video_ids": video_ids,
+        "fetched_at": time.time(),
+        "exhausted": exhausted
+    }
+    # Write atomically so concurrent ingests never read a half-written file; each write gets its own
+    # temp file, since several threads (or processes) may save the same channel at once
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=path.parent, prefix=path.stem, suffix=".tmp", delete=False) as f:
+        json.dump(entry, f)
+    try:
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+    return entry
+
+def is_fresh(entry):
+    return entry is not None and time.time() - entry.get("fetched_at", 0) < settings.CHANNEL_CACHE_TTL_SECONDS
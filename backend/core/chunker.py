@@ -0,0 +1,72 @@
+import re
+from config import settings
+
+# Sentence ends: ., ?, ! and the Devanagari danda, with any trailing quotes/brackets and whitespace
+SENTENCE_END = re.compile(r"[.?!।॥]+[\"')\]]*\s+|\s*$")
+DEVANAGARI_CHAR = re.compile(r"[ऀ-ॿ]")
+WORD = re.compile(r"\S+\s*")
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate without a tokenizer: about 4 characters per token for Latin text and
+    2 per token for Devanagari, which subword vocabularies split much more finely.
+    """
+    devanagari = len(DEVANAGARI_CHAR.findall(text))
+    return (len(text) - devanagari) // 4 + devanagari // 2 + 1
+
+def token_budget(prompt_overhead="", num_ctx=None, fraction=None):
+    """
+    Input tokens allowed per chunk: a fraction of the context window, less the fixed prompt text.
+    The rest of the window is left for the model's answer.
+    """
+    num_ctx = num_ctx or settings.OLLAMA_NUM_CTX
+    fraction = fraction or settings.CHUNK_CONTEXT_FRACTION
+    return max(int(num_ctx * fraction) - estimate_tokens(prompt_overhead), 64)
+
+def _sentences(text):
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        end = match.end()
+        if end > start:
+            yield start, end
+            start = end
+        if end >= len(text):
+            break
+
+def chunk_text(text, max_tokens):
+    """
+    Packs whole sentences into chunks of at most max_tokens (estimated). A single sentence over the
+    budget is split between words. Returns [{"start", "end", "text", "tokens"}]; the chunks cover
+    text exactly, so text[c["start"]:c["end"]] concatenated in order gives back the input.
+    """
+    chunks = []
+    start = end = tokens = 0
+    for s_start, s_end in _sentences(text):
+        sentence_tokens = estimate_tokens(text[s_start:s_end])
+        if sentence_tokens > max_tokens:
+            # Flush what we have, then cut the long sentence at word boundaries
+            if end > start:
+                chunks.append(_chunk(text, start, end, tokens))
+            start = end = s_start
+            tokens = 0
+            for word in WORD.finditer(text, s_start, s_end):
+                word_tokens = estimate_tokens(word.group())
+                if tokens + word_tokens > max_tokens and end > start:
+                    chunks.append(_chunk(text, start, end, tokens))
+                    start, tokens = end, 0
+                end = word.end()
+                tokens += word_tokens
+            # Leading whitespace that WORD did not cover stays with the current chunk
+            end = s_end
+            continue
+        if tokens + sentence_tokens > max_tokens and end > start:
+            chunks.append(_chunk(text, start, end, tokens))
+            start, tokens = end, 0
+        end = s_end
+        tokens += sentence_tokens
+    if end > start:
+        chunks.append(_chunk(text, start, end, tokens))
+    return chunks
+
+def _chunk(text, start, end, tokens):
+    return {"start": start, "end": end, "text": text[start:end], "tokens": tokens}
@@ -0,0 +1,209 @@
+import json
+import logging
+import mmap
+import os
+import pathlib
+import shutil
+import sys
+import threading
+import zlib
+from config import settings
+from backend.core.file_lock import process_lock
+
+logger = logging.getLogger("corpus_store")
+
+# Packed transcript corpus:
+#   <TRANSCRIPT_CORPUS_DIR>/<channel>/shard-00000.bin  append-only, zlib-compressed blocks of transcript text
+#   <TRANSCRIPT_CORPUS_DIR>/<channel>/index.jsonl      append-only offset index, the last line per video_id wins
+# Transcript text is split into fixed-size blocks before compression, so a byte range of one transcript
+# can be read by decompressing only the blocks that cover it.
+
+_indexes = {}
+_maps = {}
+_cache_lock = threading.Lock()  # guards _indexes and _maps, which API threadpool handlers share
+
+def enabled():
+    return settings.TRANSCRIPT_CORPUS_ENABLED
+
+def _corpus_dir():
+    return pathlib.Path(settings.TRANSCRIPT_CORPUS_DIR)
+
+def _channel_lock(corpus_dir, channel):
+    # The API and the transliteration worker both append, so the shard offset is taken under a cross-process lock
+    return process_lock(pathlib.Path(corpus_dir) / f"{channel}.lock")
+
+def _shard_path(channel_dir, shard):
+    return channel_dir / f"shard-{shard:05d}.bin"
+
+def _load_index(channel):
+    """
+    Returns {video_id: entry} for a channel, reading only index lines appended since the last call.
+    """
+    index_path = _corpus_dir() / channel / "index.jsonl"
+    with _cache_lock:
+        cached = _indexes.get(channel)
+        try:
+            stat = index_path.stat()
+        except FileNotFoundError:
+            _indexes.pop(channel, None)
+            return {}
+        # A migrate (possibly from another process) replaces the file: start over on a new inode
+        if cached is None or cached["inode"] != stat.st_ino or stat.st_size < cached["pos"]:
+            cached = {"inode": stat.st_ino, "pos": 0, "entries": {}}
+            _indexes[channel] = cached
+        if stat.st_size > cached["pos"]:
+            with open(index_path, "rb") as f:
+                f.seek(cached["pos"])
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # partially written line, pick it up next time
+                    cached["pos"] += len(raw)
+                    entry = json.loads(raw)
+                    cached["entries"][entry["video_id"]] = entry
+        return cached["entries"]
+
+def _read_range(path, start, length):
+    """
+    Reads bytes from a shard through a cached memory map. The map is replaced (and the old one closed)
+    when the shard has grown or was replaced by a migrate; the read happens under the lock so no other
+    thread closes the map mid-read.
+    """
+    with _cache_lock:
+        stat = path.stat()
+        cached = _maps.get(path)
+        if cached is None or cached["inode"] != stat.st_ino or len(cached["map"]) < stat.st_size:
+            if cached is not None:
+                cached["map"].close()
+            with open(path, "rb") as f:
+                cached = {"inode": stat.st_ino, "map": mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)}
+            _maps[path] = cached
+        return cached["map"][start:start + length]
+
+def put(channel, data, corpus_dir=None):
+    """
+    Appends a transcript record (the stored transcript JSON dict) to the channel's current shard.
+    """
+    channel_dir = pathlib.Path(corpus_dir or _corpus_dir()) / channel
+    text = (data.get("transcript") or "").encode("utf-8")
+    block_size = settings.TRANSCRIPT_CORPUS_BLOCK_SIZE
+    blocks = [zlib.compress(text[i:i + block_size], 6) for i in range(0, len(text), block_size)]
+    meta = {k: v for k, v in data.items() if k != "transcript"}
+    with _channel_lock(channel_dir.parent, channel):
+        channel_dir.mkdir(parents=True, exist_ok=True)
+        shards = sorted(channel_dir.glob("shard-*.bin"))
+        shard = int(shards[-1].stem.split("-")[1]) if shards else 0
+        shard_path = _shard_path(channel_dir, shard)
+        if shard_path.exists() and shard_path.stat().st_size >= settings.TRANSCRIPT_CORPUS_SHARD_BYTES:
+            shard += 1
+            shard_path = _shard_path(channel_dir, shard)
+        with open(shard_path, "ab") as f:
+            offset = f.tell()
+            for block in blocks:
+                f.write(block)
+        entry = {
+            "video_id": data["video_id"],
+            "shard": shard,
+            "offset": offset,
+            "blocks": [len(b) for b in blocks],
+            "block_size": block_size,
+            "text_bytes": len(text),
+            "has_transcript": data.get("transcript") is not None,
+            "meta": meta
+        }
+        with open(channel_dir / "index.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return entry
+
+def list_channels():
+    corpus_dir = _corpus_dir()
+    if not corpus_dir.exists():
+        return []
+    return [d.name for d in corpus_dir.iterdir() if d.is_dir() and (d / "index.jsonl").exists()]
+
+def list_videos(channel):
+    """
+    Returns the index entries (offsets and metadata, no transcript text) for a channel.
+    """
+    entries = _load_index(channel)
+    with _cache_lock:
+        return list(entries.values())
+
+def lookup(channel, video_id):
+    return _load_index(channel).get(video_id)
+
+def read_transcript(channel, video_id, start=0, end=None):
+    """
+    Returns transcript text for the UTF-8 byte range [start, end), decompressing only the covering blocks.
+    Returns None if the video is unknown or has no transcript.
+    """
+    entry = lookup(channel, video_id)
+    if entry is None or not entry["has_transcript"]:
+        return None
+    end = entry["text_bytes"] if end is None else min(end, entry["text_bytes"])
+    if start >= end:
+        return ""
+    block_size = entry["block_size"]
+    first, last = start // block_size, (end - 1) // block_size
+    pos = entry["offset"] + sum(entry["blocks"][:first])
+    compressed = _read_range(_shard_path(_corpus_dir() / channel, entry["shard"]), pos, sum(entry["blocks"][first:last + 1]))
+    parts = []
+    pos = 0
+    for i in range(first, last + 1):
+        parts.append(zlib.decompress(compressed[pos:pos + entry["blocks"][i]]))
+        pos += entry["blocks"][i]
+    raw = b"".join(parts)[start - first * block_size:end - first * block_size]
+    # A byte range may cut through a multi-byte character at either end
+    return raw.decode("utf-8", errors="ignore")
+
+def get(channel, video_id):
+    """
+    Returns the full stored record (metadata plus transcript) like the per-video JSON file would.
+    """
+    entry = lookup(channel, video_id)
+    if entry is None:
+        return None
+    return {**entry["meta"], "transcript": read_transcript(channel, video_id)}
+
+def migrate(transcripts_dir=None):
+    """
+    Packs every per-video JSON file under TRANSCRIPTS_DIR into a fresh corpus, then swaps it in.
+    Re-running it also compacts records superseded by later writes.
+    """
+    transcripts_dir = pathlib.Path(transcripts_dir or settings.TRANSCRIPTS_DIR)
+    corpus_dir = _corpus_dir()
+    staging_dir = corpus_dir.with_name(corpus_dir.name + ".migrating")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    count = 0
+    for channel_dir in sorted(d for d in transcripts_dir.iterdir() if d.is_dir()):
+        for json_file in sorted(channel_dir.glob("*.json")):
+            try:
+                with open(json_file, encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.error(f"Skipping unreadable transcript {json_file}: {e}")
+                continue
+            if not data.get("video_id"):
+                continue
+            put(channel_dir.name, data, corpus_dir=staging_dir)
+            count += 1
+    with _cache_lock:
+        for cached in _maps.values():
+            cached["map"].close()
+        _maps.clear()
+        _indexes.clear()
+    old_dir = corpus_dir.with_name(corpus_dir.name + ".old")
+    if corpus_dir.exists():
+        os.replace(corpus_dir, old_dir)
+    if staging_dir.exists():
+        os.replace(staging_dir, corpus_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.info(f"Migrated {count} transcripts from {transcripts_dir} into {corpus_dir}")
+    return count
+
+if __name__ == "__main__":
+    # python -m backend.core.corpus_store migrate [transcripts_dir]
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python -m backend.core.corpus_store migrate [transcripts_dir]")
+        sys.exit(1)
+    migrate(sys.argv[2] if len(sys.argv) > 2 else None)
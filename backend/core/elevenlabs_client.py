@@ -0,0 +1,130 @@
+import logging
+import math
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from config import settings
+
+logger = logging.getLogger("elevenlabs_client")
+
+class ElevenLabsError(Exception):
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: rate tokens per second, up to burst tokens saved up.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class ElevenLabsClient:
+    """
+    Shared client for ElevenLabs text-to-speech: one pooled requests.Session, a cap on in-flight requests,
+    a token-bucket request rate, and retries on 429/5xx that honour Retry-After or back off exponentially.
+    Safe to call from many threads at once.
+    """
+
+    def __init__(self, api_key=None, max_in_flight=None, requests_per_second=None, max_retries=None, backoff_seconds=None, timeout_seconds=None):
+        self.api_key = api_key or settings.ELEVENLABS_API_KEY
+        self.max_in_flight = max_in_flight or settings.ELEVENLABS_MAX_IN_FLIGHT
+        self.max_retries = settings.ELEVENLABS_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_seconds = backoff_seconds or settings.ELEVENLABS_RETRY_BACKOFF_SECONDS
+        self.timeout_seconds = timeout_seconds or settings.ELEVENLABS_TIMEOUT_SECONDS
+        self.bucket = TokenBucket(settings.ELEVENLABS_REQUESTS_PER_SECOND if requests_per_second is None else requests_per_second)
+        self._semaphore = threading.BoundedSemaphore(self.max_in_flight)
+        self._session = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+            return self._session
+
+    def _is_transient(self, status_code):
+        return status_code == 429 or status_code >= 500
+
+    def _retry_delay(self, attempt, response=None):
+        # The server's Retry-After wins (capped at timeout_seconds, so a bad header cannot stall a line);
+        # otherwise exponential backoff with jitter so parallel lines spread out
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = None
+        if delay is None or not math.isfinite(delay):
+            return self.backoff_seconds * 2 ** attempt * (0.5 + random.random())
+        return min(max(delay, 0.0), self.timeout_seconds)
+
+    def _read(self, response, stream):
+        # The streaming endpoint sends audio as it is generated; read it in chunks rather than in one body
+        if not stream or response.status_code != 200:
+            return response.content
+        audio = bytearray()
+        for chunk in response.iter_content(chunk_size=settings.ELEVENLABS_STREAM_CHUNK_BYTES):
+            audio += chunk
+        return bytes(audio)
+
+    def text_to_speech(self, voice_id, text, voice_settings=None, stream=None):
+        """
+        Synthesizes one line and returns the encoded audio bytes, in ELEVENLABS_OUTPUT_FORMAT so every
+        line has the same frame format. stream uses the /stream endpoint (default ELEVENLABS_STREAMING);
+        a line that breaks off mid-stream is requested again like any other transient failure.
+        """
+        stream = settings.ELEVENLABS_STREAMING if stream is None else stream
+        url = f"{settings.ELEVENLABS_API_URL}/text-to-speech/{voice_id}" + ("/stream" if stream else "")
+        payload = {"text": text, "model_id": settings.ELEVENLABS_MODEL_ID, "voice_settings": voice_settings or {}}
+        headers = {"xi-api-key": self.api_key}
+        params = {"output_format": settings.ELEVENLABS_OUTPUT_FORMAT}
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                with self._semaphore:
+                    with self.session().post(url, headers=headers, params=params, json=payload, timeout=(10, self.timeout_seconds), stream=stream) as response:
+                        content = self._read(response, stream)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt >= self.max_retries:
+                    raise ElevenLabsError(str(e)) from e
+                error, response = str(e), None
+            else:
+                if response.status_code == 200:
+                    return content
+                if attempt >= self.max_retries or not self._is_transient(response.status_code):
+                    raise ElevenLabsError(content.decode("utf-8", "replace"), response.status_code)
+                error = f"HTTP {response.status_code}"
+            delay = self._retry_delay(attempt, response)
+            logger.warning(f"Transient ElevenLabs failure ({error}); retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+            attempt += 1
+
+# Shared by the ElevenLabs narration endpoints
+elevenlabs = ElevenLabsClient()
@@ -0,0 +1,55 @@
+import pathlib
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are serialized
+    fcntl = None
+
+# Lock shared by the API process and the transliteration worker, which both write the sentence index and
+# the transcript corpus. Threads in one process share a reentrant lock; other processes are kept out with
+# flock on a lock file. The lock file lives outside the directory it guards, since rebuilds replace that.
+
+class ProcessLock:
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a+b")
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._rlock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._rlock.release()
+        return False
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def process_lock(path):
+    """
+    The ProcessLock for a lock file path; one instance per path in each process.
+    """
+    path = pathlib.Path(path)
+    with _locks_guard:
+        return _locks.setdefault(str(path.resolve()), ProcessLock(path))
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+
+logger = logging.getLogger("job_queue")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    pass
+
+class JobContext:
+    """
+    Passed to job handlers for progress reporting. progress() raises JobCancelled once the job is cancelled,
+    so long-running synchronous handlers stop at their next progress update.
+    """
+
+    def __init__(self, manager, job_id):
+        self._manager = manager
+        self.job_id = job_id
+        self.cancel_requested = threading.Event()
+
+    def progress(self, done, total, message=None):
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+        self._manager._update(self.job_id, progress={"done": done, "total": total, "message": message})
+
+class JobManager:
+    """
+    Persistent background jobs. Each handler belongs to a pool ("llm" or "tts") with its own worker count;
+    synchronous handlers run on a thread pool of the same size. Job records are written to JOBS_DIR so
+    status and results survive a restart, and unfinished jobs are re-queued on start().
+    """
+
+    def __init__(self, jobs_dir=None, pool_sizes=None):
+        self.jobs_dir = pathlib.Path(jobs_dir or settings.JOBS_DIR)
+        self.pool_sizes = pool_sizes or {"llm": settings.JOB_LLM_CONCURRENCY, "tts": settings.JOB_TTS_CONCURRENCY}
+        self._handlers = {}
+        self._jobs = {}
+        self._contexts = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._queues = {}
+        self._workers = []
+        self._executors = {}
+
+    def register(self, kind, handler, pool):
+        self._handlers[kind] = (handler, pool)
+
+    def _persist(self, job):
+        path = self.jobs_dir / f"{job['id']}.json"
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job["updated_at"] = time.time()
+            self._persist(job)
+            return dict(job)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        for pool, size in self.pool_sizes.items():
+            self._queues[pool] = asyncio.Queue()
+            self._executors[pool] = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"job-{pool}")
+            for _ in range(size):
+                self._workers.append(asyncio.create_task(self._worker(pool)))
+        # Reload persisted jobs and re-queue the ones that never finished
+        requeued = 0
+        for path in sorted(self.jobs_dir.glob("*.json"), key=os.path.getmtime):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    job = json.load(f)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable job record {path}: {e}")
+                continue
+            self._jobs[job["id"]] = job
+            if job["status"] not in FINISHED:
+                if job["kind"] in self._handlers:
+                    self._update(job["id"], status=QUEUED)
+                    self._contexts[job["id"]] = JobContext(self, job["id"])
+                    self._queues[self._handlers[job["kind"]][1]].put_nowait(job["id"])
+                    requeued += 1
+                else:
+                    self._update(job["id"], status=FAILED, error="Interrupted by restart; no handler registered", finished_at=time.time())
+        logger.info(f"Job manager started with pools {self.pool_sizes}; re-queued {requeued} unfinished jobs")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, kind, payload):
+        """
+        Records and queues a job; safe to call from sync endpoints running in threads.
+        """
+        if self._loop is None:
+            raise RuntimeError("Job manager is not running")
+        pool = self._handlers[kind][1]
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "pool": pool,
+            "status": QUEUED,
+            "payload": payload,
+            "progress": {"done": 0, "total": None, "message": None},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._persist(job)
+        self._contexts[job["id"]] = JobContext(self, job["id"])
+        self._loop.call_soon_threadsafe(self._queues[pool].put_nowait, job["id"])
+        logger.info(f"Queued job {job['id']} ({kind}) on pool '{pool}'")
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self, status=None):
+        with self._lock:
+            jobs = [dict(j) for j in self._jobs.values() if status is None or j["status"] == status]
+        return sorted(jobs, key=lambda j: j["created_at"], reverse=True)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        context = self._contexts.get(job_id)
+        if context:
+            context.cancel_requested.set()
+        if job["status"] == QUEUED:
+            return self._update(job_id, status=CANCELLED, finished_at=time.time())
+        task = self._tasks.get(job_id)
+        handler = self._handlers[job["kind"]][0]
+        if task is not None and asyncio.iscoroutinefunction(handler):
+            # Async handlers are cancelled right away; sync ones stop at their next progress() call
+            self._loop.call_soon_threadsafe(task.cancel)
+        return self.get(job_id)
+
+    async def _worker(self, pool):
+        queue = self._queues[pool]
+        while True:
+            job_id = await queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                queue.task_done()
+
+    async def _run(self, job_id):
+        job = self.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+        handler, pool = self._handlers[job["kind"]]
+        context = self._contexts.setdefault(job_id, JobContext(self, job_id))
+        self._update(job_id, status=RUNNING, started_at=time.time())
+        logger.info(f"Running job {job_id} ({job['kind']})")
+        try:
+            if asyncio.iscoroutinefunction(handler):
+                task = asyncio.ensure_future(handler(job["payload"], context))
+            else:
+                task = asyncio.ensure_future(self._loop.run_in_executor(self._executors[pool], handler, job["payload"], context))
+            self._tasks[job_id] = task
+            result = await task
+            if isinstance(result, dict) and result.get("error"):
+                self._update(job_id, status=FAILED, error=result["error"], result=result, finished_at=time.time())
+            else:
+                self._update(job_id, status=SUCCEEDED, result=result, finished_at=time.time())
+        except (asyncio.CancelledError, JobCancelled):
+            if not context.cancel_requested.is_set():
+                # Server shutdown: leave the job running so it is re-queued on the next start
+                raise
+            self._update(job_id, status=CANCELLED, finished_at=time.time())
+            logger.info(f"Job {job_id} cancelled")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+        finally:
+            self._tasks.pop(job_id, None)
+            self._contexts.pop(job_id, None)
+
+# Shared by all endpoints that can run in the background
+jobs = JobManager()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+import httpx
+from config import settings
+
+logger = logging.getLogger("ollama_client")
+
+class OllamaError(Exception):
+    pass
+
+def generation_stats(result):
+    """
+    Extracts Ollama's timing counters from a final response chunk; durations are in nanoseconds.
+    """
+    eval_count = result.get("eval_count") or 0
+    eval_duration = result.get("eval_duration") or 0
+    return {
+        "eval_count": eval_count,
+        "eval_duration": eval_duration,
+        "prompt_eval_count": result.get("prompt_eval_count") or 0,
+        "prompt_eval_duration": result.get("prompt_eval_duration") or 0,
+        "total_duration": result.get("total_duration") or 0,
+        "tokens_per_second": eval_count / (eval_duration / 1e9) if eval_duration else 0.0
+    }
+
+class OllamaClient:
+    """
+    Shared async client for Ollama's /api/generate: one pooled HTTP connection set per event loop,
+    a cap on in-flight requests, and retries with exponential backoff on transient failures.
+    """
+
+    def __init__(self, url=None, max_in_flight=None, max_retries=None, backoff_seconds=None, timeout_seconds=None):
+        self.url = url or settings.OLLAMA_URL
+        self.max_in_flight = max_in_flight or settings.OLLAMA_MAX_IN_FLIGHT
+        self.max_retries = settings.OLLAMA_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_seconds = backoff_seconds or settings.OLLAMA_RETRY_BACKOFF_SECONDS
+        self.timeout_seconds = timeout_seconds or settings.OLLAMA_TIMEOUT_SECONDS
+        self._loops = {}
+
+    def _state(self):
+        # httpx clients and semaphores are bound to the loop they were created on
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_seconds, connect=10.0),
+                limits=httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+            )
+            state = (client, asyncio.Semaphore(self.max_in_flight))
+            self._loops[loop] = state
+        return state
+
+    def _is_transient(self, error):
+        if isinstance(error, httpx.TransportError):
+            return True
+        return isinstance(error, httpx.HTTPStatusError) and (error.response.status_code >= 500 or error.response.status_code == 429)
+
+    async def _retry_delay(self, attempt, error):
+        delay = self.backoff_seconds * 2 ** attempt
+        if isinstance(error, httpx.HTTPStatusError):
+            error = f"HTTP {error.response.status_code}"
+        logger.warning(f"Transient Ollama failure ({error!s}); retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+        await asyncio.sleep(delay)
+
+    async def generate(self, model, prompt, options=None):
+        """
+        Runs a non-streaming generation. Returns {"response": str, "stats": {...}}.
+        """
+        client, semaphore = self._state()
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options or {}}
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    response = await client.post(self.url, json=payload)
+                    response.raise_for_status()
+                result = response.json()
+                return {"response": result.get("response", ""), "stats": generation_stats(result)}
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if attempt >= self.max_retries or not self._is_transient(e):
+                    raise OllamaError(e.response.text if isinstance(e, httpx.HTTPStatusError) else str(e)) from e
+                await self._retry_delay(attempt, e)
+                attempt += 1
+
+    async def stream(self, model, prompt, options=None):
+        """
+        Runs a streaming generation, yielding ("token", str) per chunk and finally ("stats", {...}).
+        Transient failures are only retried before the first token has been yielded.
+        """
+        client, semaphore = self._state()
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options or {}}
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with semaphore:
+                    async with client.stream("POST", self.url, json=payload) as response:
+                        if response.status_code != 200:
+                            await response.aread()
+                            response.raise_for_status()
+                        async for raw in response.aiter_lines():
+                            if not raw:
+                                continue
+                            chunk = json.loads(raw)
+                            if chunk.get("error"):
+                                raise OllamaError(chunk["error"])
+                            token = chunk.get("response", "")
+                            if token:
+                                started = True
+                                yield "token", token
+                            if chunk.get("done"):
+                                yield "stats", generation_stats(chunk)
+                                return
+                return
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if started or attempt >= self.max_retries or not self._is_transient(e):
+                    raise OllamaError(e.response.text if isinstance(e, httpx.HTTPStatusError) else str(e)) from e
+                await self._retry_delay(attempt, e)
+                attempt += 1
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.pop(loop, None)
+        if state:
+            await state[0].aclose()
+
+# Shared by the API and the transliteration worker
+ollama = OllamaClient()
@@ -22,6 +22,60 @@ Format:
 Write the entire script in {script_language}. If {script_language} is Hinglish, use Latin script for all Hindi words and mix with English naturally, as in real Hinglish conversations. Do not use Devanagari script.
 """
 
+def get_podcast_outline_prompt(char1: str, char2: str, topic: str, length_minutes: int, num_sections: int) -> str:
+    """
+    Generates the prompt for outlining a long podcast episode into sections.
+    """
+    return f"""
+You are an expert podcast producer. Plan a {length_minutes}-minute podcast conversation between two hosts, {char1} and {char2}, on the topic: \"{topic}\".
+
+Split the episode into exactly {num_sections} consecutive sections. The first section opens the show with a brief introduction and the last section ends it with a natural outro.
+
+Output ONLY the outline, one section per line, in this exact format:
+1. <section title>: <one sentence describing what the hosts discuss>
+2. <section title>: <one sentence describing what the hosts discuss>
+(continue up to {num_sections})
+"""
+
+def get_podcast_section_prompt(char1: str, char2: str, char1_samples: list, char2_samples: list, topic: str, outline: str, section_number: int, num_sections: int, section: str, previous_section: str, next_section: str, section_words: int, script_language: str) -> str:
+    """
+    Generates the prompt for writing one section of a long podcast script from the shared outline.
+    """
+    if section_number == 1:
+        position = "This is the opening section: start with a brief introduction of the show and the hosts."
+    elif section_number == num_sections:
+        position = "This is the final section: wrap up the conversation and end with a natural outro."
+    else:
+        position = "This section is in the middle of the episode: do not greet the audience and do not say goodbye."
+    handoff = ""
+    if previous_section:
+        handoff += f"\nThe previous section covered: {previous_section}. Continue naturally from there without repeating it."
+    if next_section:
+        handoff += f"\nThe next section will cover: {next_section}. End this section with a line that leads into it."
+    return f"""
+You are an expert podcast scriptwriter. You are writing section {section_number} of {num_sections} of a podcast conversation between two hosts:
+
+- {char1}: Here are some example lines in their style: {char1_samples}
+- {char2}: Here are some example lines in their style: {char2_samples}
+
+The topic of the podcast is: \"{topic}\". The full episode outline is:
+{outline}
+
+Write ONLY section {section_number}: {section}
+{position}{handoff}
+
+The section should be roughly {section_words} words. Alternate their dialogue naturally, making sure each host's personality and style comes through.
+
+**Important:** For each line of dialogue, add a short expression or action in square brackets that describes how the host is speaking, reacting, or gesturing (e.g., [laughs], [smiling], [thoughtful pause], [raises eyebrow], [enthusiastic], [shrugs], etc.).
+
+Format (no headings, no section titles, no narration):
+{char1}: [expression] ...
+{char2}: [expression] ...
+(repeat)
+
+Write the entire section in {script_language}. If {script_language} is Hinglish, use Latin script for all Hindi words and mix with English naturally, as in real Hinglish conversations. Do not use Devanagari script.
+"""
+
 def get_transliteration_prompt(chunk: str) -> str:
     """
     Generates the prompt for transliterating Hindi text to Hinglish.
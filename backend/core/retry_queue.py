@@ -0,0 +1,57 @@
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger("retry_queue")
+
+class RetryQueue:
+    """
+    Runs handler(key) in a background thread at scheduled times. Each key is scheduled at most once;
+    rescheduling a key to an earlier time moves it forward.
+    """
+
+    def __init__(self, handler, name="retry_queue"):
+        self._handler = handler
+        self._name = name
+        self._heap = []
+        self._scheduled = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, key, when=None):
+        when = time.time() if when is None else when
+        with self._cond:
+            if key in self._scheduled and self._scheduled[key] <= when:
+                return
+            self._scheduled[key] = when
+            heapq.heappush(self._heap, (when, key))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return dict(self._scheduled)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                when, key = self._heap[0]
+                if self._scheduled.get(key) != when:
+                    # Superseded by an earlier schedule for the same key
+                    heapq.heappop(self._heap)
+                    continue
+                delay = when - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                del self._scheduled[key]
+            try:
+                self._handler(key)
+            except Exception as e:
+                logger.error(f"{self._name}: retry handler failed for {key}: {e}")
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import random
+import re
+import shutil
+import struct
+from config import settings
+from backend.core import corpus_store
+from backend.core.file_lock import process_lock
+
+logger = logging.getLogger("sentence_index")
+
+# Per-youtuber sentence index:
+#   <SENTENCE_INDEX_DIR>/<youtuber>/sentences.bin  UTF-8 sentence text, append-only
+#   <SENTENCE_INDEX_DIR>/<youtuber>/records.bin    fixed-width records, one per sentence (see RECORD)
+#   <SENTENCE_INDEX_DIR>/<youtuber>/videos.json    video_id -> transcript hash and record range
+#   <SENTENCE_INDEX_DIR>/<youtuber>.lock           cross-process write lock (kept outside the directory a rebuild replaces)
+# Sampling picks random record numbers and reads them directly, so it costs the same regardless of corpus size.
+
+RECORD = struct.Struct("<QIHBB")  # text offset, text length (bytes), word count, script type, flags
+SCRIPT_LATIN = 0
+SCRIPT_DEVANAGARI = 1
+SCRIPT_MIXED = 2
+FLAG_DELETED = 1
+
+SENTENCE_SPLIT = re.compile(r"[.?!\u0964\u0965]+")
+DEVANAGARI_CHAR = re.compile(r"[\u0900-\u097F]")
+LATIN_CHAR = re.compile(r"[A-Za-z]")
+
+def _youtuber_lock(youtuber):
+    # The API and the transliteration worker both append to the index, so the lock also spans processes
+    return process_lock(pathlib.Path(settings.SENTENCE_INDEX_DIR) / f"{youtuber}.lock")
+
+def _index_dir(youtuber):
+    return pathlib.Path(settings.SENTENCE_INDEX_DIR) / youtuber
+
+def split_sentences(text):
+    """
+    Splits transcript text into sentences on ., ?, ! and the Devanagari danda.
+    """
+    return [s.strip() for s in SENTENCE_SPLIT.split(text) if s.strip()]
+
+def script_type(sentence):
+    has_devanagari = bool(DEVANAGARI_CHAR.search(sentence))
+    has_latin = bool(LATIN_CHAR.search(sentence))
+    if has_devanagari and has_latin:
+        return SCRIPT_MIXED
+    return SCRIPT_DEVANAGARI if has_devanagari else SCRIPT_LATIN
+
+def _iter_transcripts(youtuber):
+    # Source transcripts: the packed corpus when enabled, the per-video JSON files otherwise
+    if corpus_store.enabled():
+        for entry in corpus_store.list_videos(youtuber):
+            if entry["has_transcript"]:
+                yield entry["video_id"], corpus_store.read_transcript(youtuber, entry["video_id"])
+        return
+    transcript_dir = pathlib.Path(settings.TRANSCRIPTS_DIR) / youtuber
+    for json_file in transcript_dir.glob("*.json"):
+        try:
+            with open(json_file, encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Skipping unreadable transcript {json_file}: {e}")
+            continue
+        if data.get("transcript") and data.get("video_id"):
+            yield data["video_id"], data["transcript"]
+
+def _load_videos(index_dir):
+    videos_path = index_dir / "videos.json"
+    if not videos_path.exists():
+        return {}
+    with open(videos_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_videos(index_dir, videos):
+    tmp_path = index_dir / "videos.json.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(videos, f)
+    os.replace(tmp_path, index_dir / "videos.json")
+
+def _record_count(index_dir):
+    records_path = index_dir / "records.bin"
+    return records_path.stat().st_size // RECORD.size if records_path.exists() else 0
+
+def _append(index_dir, videos, video_id, text):
+    """
+    Appends the sentences of one transcript, tombstoning any records from an older version of it.
+    """
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    previous = videos.get(video_id)
+    if previous and previous["hash"] == digest:
+        return 0
+    with open(index_dir / "records.bin", "r+b" if (index_dir / "records.bin").exists() else "w+b") as records:
+        if previous:
+            for i in range(previous["first"], previous["first"] + previous["count"]):
+                records.seek(i * RECORD.size + RECORD.size - 1)
+                records.write(bytes([FLAG_DELETED]))
+        records.seek(0, os.SEEK_END)
+        first = records.tell() // RECORD.size
+        count = 0
+        with open(index_dir / "sentences.bin", "ab") as sentences:
+            offset = sentences.tell()
+            for sentence in split_sentences(text):
+                raw = sentence.encode("utf-8")
+                sentences.write(raw)
+                records.write(RECORD.pack(offset, len(raw), min(len(sentence.split()), 0xFFFF), script_type(sentence), 0))
+                offset += len(raw)
+                count += 1
+    deleted = previous.get("deleted", 0) + previous["count"] if previous else 0
+    videos[video_id] = {"hash": digest, "first": first, "count": count, "deleted": deleted}
+    return count
+
+def add_transcript(youtuber, video_id, text):
+    """
+    Adds (or replaces) one transcript's sentences. Called on ingest and after transliteration.
+    """
+    if not text:
+        return 0
+    index_dir = _index_dir(youtuber)
+    with _youtuber_lock(youtuber):
+        if not (index_dir / "videos.json").exists():
+            # Building from scratch also picks up this transcript
+            build(youtuber)
+            return 0
+        videos = _load_videos(index_dir)
+        added = _append(index_dir, videos, video_id, text)
+        _save_videos(index_dir, videos)
+        deleted = sum(v.get("deleted", 0) for v in videos.values())
+        if deleted > _record_count(index_dir) // 2:
+            build(youtuber)
+    return added
+
+def build(youtuber):
+    """
+    (Re)builds a youtuber's sentence index from their stored transcripts. Returns the number of sentences.
+    """
+    index_dir = _index_dir(youtuber)
+    staging_dir = index_dir.with_name(index_dir.name + ".building")
+    with _youtuber_lock(youtuber):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        staging_dir.mkdir(parents=True)
+        videos = {}
+        total = 0
+        for video_id, text in _iter_transcripts(youtuber):
+            total += _append(staging_dir, videos, video_id, text)
+        _save_videos(staging_dir, videos)
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.replace(staging_dir, index_dir)
+    logger.info(f"Built sentence index for {youtuber}: {total} sentences from {len(videos)} transcripts")
+    return total
+
+def sample(youtuber, n, rng=None, min_words=0):
+    """
+    Draws up to n random sentences for a youtuber without reading any transcript files.
+    """
+    rng = rng or random
+    index_dir = _index_dir(youtuber)
+    if not (index_dir / "videos.json").exists():
+        build(youtuber)
+    total = _record_count(index_dir)
+    if total == 0:
+        return []
+    picked = []
+    seen = set()
+    try:
+        with open(index_dir / "records.bin", "rb") as records, open(index_dir / "sentences.bin", "rb") as sentences:
+            # Bounded rejection sampling over tombstoned or too-short records
+            for _ in range(max(n * 20, 50)):
+                if len(picked) >= n or len(seen) >= total:
+                    break
+                i = rng.randrange(total)
+                if i in seen:
+                    continue
+                seen.add(i)
+                records.seek(i * RECORD.size)
+                offset, length, words, _script, flags = RECORD.unpack(records.read(RECORD.size))
+                if flags & FLAG_DELETED or words < min_words:
+                    continue
+                sentences.seek(offset)
+                picked.append(sentences.read(length).decode("utf-8"))
+    except FileNotFoundError:
+        # The index is being rebuilt right now
+        logger.warning(f"Sentence index for {youtuber} is being rebuilt, no samples drawn")
+    return picked
@@ -0,0 +1,195 @@
+import logging
+import os
+import re
+import threading
+import zlib
+import numpy as np
+from scipy import sparse
+from backend.core import sentence_index
+
+logger = logging.getLogger("topic_index")
+
+# Per-youtuber lexical index over the sentence index, stored next to it as
+#   <SENTENCE_INDEX_DIR>/<youtuber>/topic.npz
+# Rows are sentence records (same numbering as records.bin); columns are hashed terms. Rows hold
+# L2-normalized log term frequencies and the document frequencies are kept separately, so new
+# transcripts only append rows and idf is applied to the query at search time (lnc.ltc TF-IDF).
+# Searches pick up sentences added since the last update, so ingest never pays for this index.
+# A sentence index rebuild replaces its directory, which drops this file and forces a rebuild here too.
+
+N_FEATURES = 1 << 18
+TOKEN = re.compile(r"\w+")
+RECORD_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u4"), ("words", "<u2"), ("script", "u1"), ("flags", "u1")])
+
+_cache = {}
+_guards = {}
+_guards_lock = threading.Lock()
+
+def _term_ids(text):
+    return [zlib.crc32(token.encode("utf-8")) & (N_FEATURES - 1) for token in TOKEN.findall(text.lower())]
+
+def _vectorize(texts):
+    """
+    Hashed, sublinear-tf, L2-normalized rows for a list of sentences.
+    """
+    indptr = [0]
+    indices = []
+    data = []
+    for text in texts:
+        ids, counts = np.unique(np.array(_term_ids(text), dtype=np.int64), return_counts=True)
+        weights = 1.0 + np.log(counts)
+        norm = np.sqrt((weights ** 2).sum())
+        indices.extend(ids.tolist())
+        data.extend((weights / norm if norm else weights).tolist())
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(texts), N_FEATURES)
+    )
+
+def _read_records(index_dir):
+    records_path = index_dir / "records.bin"
+    if not records_path.exists():
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.fromfile(records_path, dtype=RECORD_DTYPE)
+
+def _read_sentences(index_dir, records):
+    with open(index_dir / "sentences.bin", "rb") as f:
+        start = int(records["offset"][0])
+        end = int(records["offset"][-1] + records["length"][-1])
+        f.seek(start)
+        blob = f.read(end - start)
+    return [blob[o - start:o - start + n].decode("utf-8") for o, n in zip(records["offset"].tolist(), records["length"].tolist())]
+
+def _read_sentences_at(index_dir, records, rows):
+    with open(index_dir / "sentences.bin", "rb") as f:
+        for row in rows.tolist():
+            f.seek(int(records["offset"][row]))
+            yield f.read(int(records["length"][row])).decode("utf-8")
+
+def _document_frequency(matrix, rows=None):
+    sub = matrix if rows is None else matrix[rows]
+    return np.bincount(sub.indices, minlength=N_FEATURES).astype(np.int32)
+
+def _save(index_dir, state):
+    tmp_path = index_dir / "topic.npz.tmp"
+    matrix = state["matrix"]
+    with open(tmp_path, "wb") as f:
+        np.savez(f, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr, df=state["df"], deleted=state["deleted"])
+    os.replace(tmp_path, index_dir / "topic.npz")
+
+def _load(index_dir):
+    path = index_dir / "topic.npz"
+    if not path.exists():
+        return None
+    with np.load(path) as f:
+        rows = len(f["indptr"]) - 1
+        matrix = sparse.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=(rows, N_FEATURES))
+        return {"matrix": matrix, "df": f["df"], "deleted": f["deleted"]}
+
+def update(youtuber):
+    """
+    Brings a youtuber's topic index in line with their sentence index: vectorizes records appended since
+    the last update and removes tombstoned ones from the document frequencies. Returns the number of new rows.
+    """
+    index_dir = sentence_index._index_dir(youtuber)
+    with sentence_index._youtuber_lock(youtuber):
+        if not (index_dir / "videos.json").exists():
+            sentence_index.build(youtuber)
+        records = _read_records(index_dir)
+        state = _load(index_dir)
+        # A youtuber without any sentences still gets a (empty) topic.npz, so searches can load it
+        fresh = state is None or state["matrix"].shape[0] > len(records)
+        if fresh:
+            state = {
+                "matrix": sparse.csr_matrix((0, N_FEATURES), dtype=np.float32),
+                "df": np.zeros(N_FEATURES, dtype=np.int32),
+                "deleted": np.zeros(0, dtype=bool)
+            }
+        known = state["matrix"].shape[0]
+        deleted = (records["flags"] & sentence_index.FLAG_DELETED).astype(bool)
+        newly_deleted = np.flatnonzero(deleted[:known] & ~state["deleted"])
+        if not fresh and len(records) == known and len(newly_deleted) == 0:
+            return 0
+        df = state["df"]
+        if len(newly_deleted):
+            df = df - _document_frequency(state["matrix"], newly_deleted)
+        matrix = state["matrix"]
+        if len(records) > known:
+            added = _vectorize(_read_sentences(index_dir, records[known:]))
+            # Only live rows count towards document frequency
+            live = np.flatnonzero(~deleted[known:])
+            df = df + _document_frequency(added, live)
+            matrix = sparse.vstack([matrix, added], format="csr")
+        state = {"matrix": matrix, "df": df, "deleted": deleted}
+        _save(index_dir, state)
+    logger.info(f"Updated topic index for {youtuber}: {len(records) - known} new sentences, {len(newly_deleted)} removed")
+    return len(records) - known
+
+def _stamp(path):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def _cache_guard(youtuber):
+    # One guard per youtuber, so rebuilding one youtuber's matrix does not hold up searches for the others
+    with _guards_lock:
+        return _guards.setdefault(youtuber, threading.Lock())
+
+def _state(youtuber):
+    # Any append or tombstone touches records.bin, so one stat() tells whether the cached matrix is current
+    index_dir = sentence_index._index_dir(youtuber)
+    with _cache_guard(youtuber):
+        stamp = _stamp(index_dir / "records.bin")
+        state = _cache.get(youtuber)
+        if state is None or state["stamp"] != stamp:
+            update(youtuber)
+            state = _load(index_dir)
+            if state is None:
+                return None
+            state["records"] = _read_records(index_dir)
+            state["stamp"] = stamp
+            _cache[youtuber] = state
+        return state
+
+def search(youtuber, query, k, min_words=0):
+    """
+    Returns up to k of the youtuber's sentences most similar to query, best first. Sentences sharing no
+    terms with the query are never returned, so the result may be shorter than k.
+    """
+    terms = _term_ids(query)
+    if not terms or k <= 0:
+        return []
+    state = _state(youtuber)
+    if state is None or state["matrix"].shape[0] == 0:
+        return []
+    matrix, records = state["matrix"], state["records"][:state["matrix"].shape[0]]
+    live_docs = max(int((~state["deleted"]).sum()), 1)
+    ids, counts = np.unique(np.array(terms, dtype=np.int64), return_counts=True)
+    df = state["df"][ids]
+    known = df > 0
+    if not known.any():
+        return []
+    ids, counts, df = ids[known], counts[known], df[known]
+    weights = (1.0 + np.log(counts)) * np.log(live_docs / df)
+    query_vector = np.zeros(N_FEATURES, dtype=np.float32)
+    query_vector[ids] = weights / (np.sqrt((weights ** 2).sum()) or 1.0)
+    scores = matrix @ query_vector
+    scores[state["deleted"][:len(scores)] | (records["words"] < min_words)] = 0.0
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) == 0:
+        return []
+    top = candidates[np.argsort(-scores[candidates], kind="stable")]
+    index_dir = sentence_index._index_dir(youtuber)
+    picked = []
+    seen = set()
+    # Read a few extra so duplicate sentences can be skipped
+    for sentence in _read_sentences_at(index_dir, records, top[:k * 3]):
+        if sentence not in seen:
+            seen.add(sentence)
+            picked.append(sentence)
+            if len(picked) >= k:
+                break
+    return picked
@@ -0,0 +1,122 @@
+import json
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+from config import settings
+
+logger = logging.getLogger("transcript_index")
+
+_local = threading.local()
+_rebuild_lock = threading.Lock()
+_generation = 0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    channel_name TEXT,
+    video_title TEXT,
+    has_transcript INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+)
+"""
+
+def _connect():
+    """
+    Returns this thread's connection to the index, rebuilding the index from TRANSCRIPTS_DIR if the db file is missing.
+    """
+    global _generation
+    db_path = pathlib.Path(settings.TRANSCRIPT_INDEX_DB)
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "generation", None) == _generation and db_path.exists():
+        return conn
+    with _rebuild_lock:
+        if conn is not None:
+            conn.close()
+        missing = not db_path.exists()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(SCHEMA)
+        conn.commit()
+        if missing:
+            rebuild(conn)
+            _generation += 1
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+def rebuild(conn=None):
+    """
+    Scans TRANSCRIPTS_DIR and (re)populates the index. Returns the number of indexed transcripts.
+    """
+    conn = conn or _connect()
+    transcripts_dir = pathlib.Path(settings.TRANSCRIPTS_DIR)
+    rows = []
+    if transcripts_dir.exists():
+        for channel_dir in transcripts_dir.iterdir():
+            if not channel_dir.is_dir():
+                continue
+            for path in channel_dir.glob("*.json"):
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        data = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Could not index {path}: {e}")
+                    continue
+                if not data.get("video_id"):
+                    continue
+                rows.append((data["video_id"], str(path), channel_dir.name, data.get("video_title"), int(bool(data.get("transcript"))), path.stat().st_mtime))
+    conn.execute("DELETE FROM videos")
+    conn.executemany(
+        "INSERT OR REPLACE INTO videos (video_id, path, channel_name, video_title, has_transcript, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.commit()
+    logger.info(f"Rebuilt transcript index with {len(rows)} entries from {transcripts_dir}")
+    return len(rows)
+
+def lookup(video_id):
+    """
+    Returns the index entry for a video_id as a dict, or None if it is unknown or its file has gone missing.
+    """
+    conn = _connect()
+    row = conn.execute(
+        "SELECT video_id, path, channel_name, video_title, has_transcript, updated_at FROM videos WHERE video_id = ?",
+        (video_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    entry = dict(zip(("video_id", "path", "channel_name", "video_title", "has_transcript", "updated_at"), row))
+    if not pathlib.Path(entry["path"]).exists():
+        remove(video_id)
+        return None
+    entry["has_transcript"] = bool(entry["has_transcript"])
+    return entry
+
+def record(video_id, path, channel_name=None, video_title=None, has_transcript=False):
+    """
+    Adds or updates the index entry for a stored transcript file.
+    """
+    conn = _connect()
+    conn.execute(
+        "INSERT OR REPLACE INTO videos (video_id, path, channel_name, video_title, has_transcript, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (video_id, str(path), channel_name, video_title, int(bool(has_transcript)), time.time())
+    )
+    conn.commit()
+
+def list_missing():
+    """
+    Returns index entries for stored negative results (no transcript).
+    """
+    conn = _connect()
+    rows = conn.execute("SELECT video_id, path FROM videos WHERE has_transcript = 0").fetchall()
+    return [{"video_id": video_id, "path": path} for video_id, path in rows]
+
+def remove(video_id):
+    conn = _connect()
+    conn.execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+    conn.commit()
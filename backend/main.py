@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
@@ -5,10 +7,30 @@ from backend.api.transcript_listing import router as transcript_listing_router
 from backend.api.llm_generate import router as llm_generate_router
 from backend.api.narrate_elevenlabs import router as narrate_script_router
 from backend.api.narrate_bark import router as narrate_script_bark_router
-from backend.api.youtube_fetch import router as youtube_fetch_router
+from backend.api.youtube_fetch import router as youtube_fetch_router, schedule_pending_retries
+from backend.api.jobs import router as jobs_router
+from backend.core.bark_models import bark_models
+from backend.core.bark_pool import bark_pools
+from backend.core.job_queue import jobs
+from backend.core.ollama_client import ollama
 from config import settings
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Pick up transcripts that failed before the last shutdown
+    schedule_pending_retries()
+    await jobs.start()
+    if settings.BARK_PRELOAD:
+        # Load and warm up Bark in the background; narration requests wait for it if they arrive first
+        threading.Thread(target=bark_models.load, kwargs={"warm_up": True}, name="bark_preload", daemon=True).start()
+    bark_models.start_idle_monitor()
+    yield
+    await jobs.stop()
+    await ollama.aclose()
+    for pool in bark_pools.values():
+        pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Setup logging
 logging.basicConfig(
@@ -35,3 +57,4 @@ app.include_router(llm_generate_router)
 app.include_router(narrate_script_router)
 app.include_router(narrate_script_bark_router)
 app.include_router(youtube_fetch_router)
+app.include_router(jobs_router)
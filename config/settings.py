@@ -7,16 +7,87 @@ load_dotenv()
 API_BASE = "http://localhost:8000/api"
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 
+# Shared Ollama client
+OLLAMA_MAX_IN_FLIGHT = int(os.getenv("OLLAMA_MAX_IN_FLIGHT", "4"))
+OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "3"))
+OLLAMA_RETRY_BACKOFF_SECONDS = float(os.getenv("OLLAMA_RETRY_BACKOFF_SECONDS", "1.0"))
+OLLAMA_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "600"))
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))  # context window requested for long-text stages
+CHUNK_CONTEXT_FRACTION = 0.4  # share of OLLAMA_NUM_CTX a chunk of input may use
+
 # ElevenLabs API Keys
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 ELEVENLABS_VOICE_ID1 = os.getenv("ELEVENLABS_VOICE_ID1")
 ELEVENLABS_VOICE_ID2 = os.getenv("ELEVENLABS_VOICE_ID2")
+ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1"
+ELEVENLABS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2")  # the API's default model, sent explicitly so it is part of the line cache key
+ELEVENLABS_MAX_IN_FLIGHT = int(os.getenv("ELEVENLABS_MAX_IN_FLIGHT", "3"))  # concurrent requests; keep within your plan's concurrency limit
+ELEVENLABS_REQUESTS_PER_SECOND = float(os.getenv("ELEVENLABS_REQUESTS_PER_SECOND", "2.0"))  # token-bucket rate; 0 disables it
+ELEVENLABS_MAX_RETRIES = int(os.getenv("ELEVENLABS_MAX_RETRIES", "4"))  # on 429 and 5xx
+ELEVENLABS_RETRY_BACKOFF_SECONDS = float(os.getenv("ELEVENLABS_RETRY_BACKOFF_SECONDS", "1.0"))  # used when there is no Retry-After
+ELEVENLABS_TIMEOUT_SECONDS = float(os.getenv("ELEVENLABS_TIMEOUT_SECONDS", "60"))
+ELEVENLABS_OUTPUT_FORMAT = "mp3_44100_128"  # one frame format for every line, so mp3 episodes are joined without re-encoding
+ELEVENLABS_STREAMING = os.getenv("ELEVENLABS_STREAMING", "1") == "1"  # use the /stream endpoint with chunked reads
+ELEVENLABS_STREAM_CHUNK_BYTES = 16 * 1024
 
 # Data Directories
 TRANSCRIPTS_DIR = "data/transcripts"
 SAVED_SCRIPTS_DIR = "data/saved_scripts"
 NARRATED_PODCASTS_DIR = "data/narrated_podcasts"
 NARRATED_PODCASTS_BARK_DIR = "data/narrated_podcasts_bark"
+TRANSCRIPT_INDEX_DB = "data/transcript_index.db"
+SENTENCE_INDEX_DIR = "data/sentence_index"
+LLM_CACHE_DB = "data/cache/llm_responses.db"
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Script generation
+SCRIPT_WORDS_PER_MINUTE = 170
+TOPIC_SAMPLE_MIN_WORDS = 5  # shortest sentence used as a topic-matched style sample
+LONG_FORM_MIN_MINUTES = int(os.getenv("LONG_FORM_MIN_MINUTES", "15"))  # outline + parallel sections at or above this length
+LONG_FORM_MINUTES_PER_SECTION = 5  # sections run in parallel up to OLLAMA_MAX_IN_FLIGHT (set OLLAMA_NUM_PARALLEL on the server to match)
+
+# Narration
+AUDIO_CACHE_DB = "data/cache/line_audio.db"
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Bark models
+BARK_PRELOAD = os.getenv("BARK_PRELOAD", "0") == "1"  # load and warm up at server startup
+BARK_IDLE_UNLOAD_SECONDS = int(os.getenv("BARK_IDLE_UNLOAD_SECONDS", "0"))  # 0 keeps models resident
+BARK_WARMUP_TEXT = "Hello."
+BARK_DEFAULT_PRESET = "v2/en_speaker_6"
+BARK_WORKERS = int(os.getenv("BARK_WORKERS", "0"))  # >1 synthesizes lines in that many worker processes
+BARK_THREADS_PER_WORKER = int(os.getenv("BARK_THREADS_PER_WORKER", "0"))  # 0 splits the CPU cores evenly
+
+# Background jobs
+JOBS_DIR = "data/jobs"
+JOB_LLM_CONCURRENCY = int(os.getenv("JOB_LLM_CONCURRENCY", "2"))
+JOB_TTS_CONCURRENCY = int(os.getenv("JOB_TTS_CONCURRENCY", "1"))
+
+# Packed transcript corpus (optional; migrate with `python -m backend.core.corpus_store migrate`)
+TRANSCRIPT_CORPUS_ENABLED = os.getenv("TRANSCRIPT_CORPUS_ENABLED", "0") == "1"
+TRANSCRIPT_CORPUS_DIR = "data/transcript_corpus"
+TRANSCRIPT_CORPUS_BLOCK_SIZE = 64 * 1024  # uncompressed bytes per compressed block
+TRANSCRIPT_CORPUS_SHARD_BYTES = 64 * 1024 * 1024  # start a new shard after this size
+
+# YouTube ingestion
+INGEST_MAX_CONCURRENCY = int(os.getenv("INGEST_MAX_CONCURRENCY", "8"))
+CHANNEL_CACHE_DIR = "data/channel_cache"
+CHANNEL_CACHE_TTL_SECONDS = int(os.getenv("CHANNEL_CACHE_TTL_SECONDS", "3600"))
+CHANNEL_LISTING_PAGE_SIZE = 30  # playlist entries enumerated per yt-dlp call
+CHANNEL_LISTING_MAX_SCAN = 1000  # never walk further than this into a channel
+NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("NEGATIVE_CACHE_TTL_SECONDS", str(24 * 3600)))
+TRANSCRIPT_RETRY_BASE_SECONDS = int(os.getenv("TRANSCRIPT_RETRY_BASE_SECONDS", "300"))
+TRANSCRIPT_RETRY_MAX_ATTEMPTS = int(os.getenv("TRANSCRIPT_RETRY_MAX_ATTEMPTS", "6"))
+
+# Transliteration worker
+TRANSLITERATION_MAX_IN_FLIGHT = int(os.getenv("TRANSLITERATION_MAX_IN_FLIGHT", str(OLLAMA_MAX_IN_FLIGHT)))  # chunk requests across all files; also capped by OLLAMA_MAX_IN_FLIGHT
+TRANSLITERATION_FILE_CONCURRENCY = int(os.getenv("TRANSLITERATION_FILE_CONCURRENCY", "4"))
+TRANSLITERATION_CACHE_DB = "data/cache/transliteration.db"
+TRANSLITERATION_CACHE_MAX_BYTES = int(os.getenv("TRANSLITERATION_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+TRANSLITERATION_RULES_ENABLED = os.getenv("TRANSLITERATION_RULES_ENABLED", "1") == "1"  # offline rules first, LLM only for uncertain words
+TRANSLITERATION_MANIFEST = "data/transliteration/manifest.json"
+TRANSLITERATION_CHECKPOINT_DIR = "data/transliteration/checkpoints"
+TRANSLITERATION_WATCH_INTERVAL_SECONDS = int(os.getenv("TRANSLITERATION_WATCH_INTERVAL_SECONDS", "60"))
 
 # Logging
 LOGS_DIR = "logs"
@@ -5,6 +5,7 @@ import os
 import sys
 import pathlib
 import json
+import time
 
 # Add the project root to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -13,6 +14,26 @@ from config import settings
 
 API_BASE = settings.API_BASE
 
+def run_narration_job(tts_option, narrate_payload):
+    # Narration runs as a background job on the API; poll its progress instead of blocking on one long request
+    endpoint = "narrate_script" if tts_option == "ElevenLabs" else "narrate_script_bark"
+    resp = requests.post(f"{API_BASE}/{endpoint}", json={**narrate_payload, "background": True})
+    if resp.status_code != 200 or not resp.json().get("job_id"):
+        return None, resp.text
+    job_id = resp.json()["job_id"]
+    progress_bar = st.progress(0.0)
+    while True:
+        job = requests.get(f"{API_BASE}/jobs/{job_id}").json()
+        progress = job.get("progress") or {}
+        if progress.get("total"):
+            progress_bar.progress(min(progress["done"] / progress["total"], 1.0), text=progress.get("message") or "")
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            break
+        time.sleep(2)
+    if job["status"] == "succeeded":
+        return job["result"], None
+    return None, job.get("error") or job["status"]
+
 st.title("YouTube Podcast Transcript Studio")
 
 # Sidebar for navigation
@@ -23,22 +44,31 @@ page = st.sidebar.radio("Go to", ["Extract Transcript", "Create Podcast Script",
 if page == "Extract Transcript":
     st.header("Extract YouTube Transcript")
     st.write("Enter a YouTuber's channel name or URL to fetch video transcripts.")
-    youtuber = st.text_input("YouTuber Channel Name or URL", "@samayrainaofficial")
+    youtuber = st.text_input("YouTuber Channel Name or URL (comma separated for several)", "@samayrainaofficial")
     num_videos = st.number_input("Number of latest videos", min_value=1, max_value=20, value=3)
     if st.button("Fetch Transcripts"):
         with st.spinner("Fetching video list and transcripts via API..."):
-            resp = requests.get(f"{API_BASE}/channel_videos", params={"youtuber": youtuber, "num_videos": num_videos})
-            video_ids = resp.json() if resp.status_code == 200 else []
-            if not video_ids:
-                st.error("No videos found for this channel.")
-            else:
-                for vid in video_ids:
-                    st.markdown(f"### Video: https://youtu.be/{vid}")
-                    data = requests.get(f"{API_BASE}/transcript", params={"video_id": vid}).json()
+            # Channels may be comma separated; transcripts are fetched concurrently and streamed back
+            channels = [c.strip() for c in youtuber.split(",") if c.strip()]
+            resp = requests.post(f"{API_BASE}/batch_ingest", json={"channels": channels, "num_videos": num_videos}, stream=True)
+            progress = st.progress(0.0)
+            total = 0
+            for raw in resp.iter_lines():
+                if not raw:
+                    continue
+                event = json.loads(raw)
+                if event["event"] == "start":
+                    total = event["total"]
+                    if not total:
+                        st.error("No videos found for this channel.")
+                elif event["event"] == "video":
+                    progress.progress(event["completed"] / max(event["total"], 1))
+                    data = event["result"]
+                    st.markdown(f"### Video: https://youtu.be/{event['video_id']}")
                     if data and data.get("transcript"):
                         lang = data.get("language", "?")
                         gen = "Auto-generated" if data.get("is_generated") else "Manual"
-                        st.text_area(f"Transcript ({lang}, {gen})", data["transcript"], height=200)
+                        st.text_area(f"Transcript ({lang}, {gen})", data["transcript"], height=200, key=f"transcript_{event['video_id']}")
                     else:
                         st.warning(f"Transcript not available: {data.get('error') if data else 'Unknown error'}")
     st.write("Or, provide a direct YouTube video link to fetch its transcript.")
@@ -70,6 +100,7 @@ if page == "Create Podcast Script":
             char2 = st.selectbox("Select Character 2", [y for y in youtubers if y != st.session_state.get('char1')], key="char2")
         topic = st.text_input("Podcast Topic", "comedy")
         length = st.slider("Podcast Length (minutes)", min_value=5, max_value=30, value=10)
+        seed = st.number_input("Seed (0 = random; a fixed seed makes the script reproducible)", min_value=0, value=0, step=1)
         if st.button("Generate Podcast Script"):
             with st.spinner("Generating podcast script using LLM..."):
                 payload = {
@@ -77,19 +108,45 @@ if page == "Create Podcast Script":
                     "char2": char2,
                     "topic": topic,
                     "length_minutes": length,
-                    "model": "mistral"
+                    "model": "mistral",
+                    "seed": int(seed) if seed else None
                 }
-                resp = requests.post(f"{API_BASE}/generate_podcast_script", json=payload)
-                if resp.status_code == 200 and resp.json().get("script"):
+                # Stream tokens so the script appears as it is written
+                resp = requests.post(f"{API_BASE}/generate_podcast_script_stream", json=payload, stream=True)
+                live_script = st.empty()
+                partial = ""
+                sections = {}
+                result = {}
+                event_name = None
+                for raw in resp.iter_lines(decode_unicode=True):
+                    if raw.startswith("event: "):
+                        event_name = raw[len("event: "):]
+                    elif raw.startswith("data: "):
+                        data = json.loads(raw[len("data: "):])
+                        if event_name == "token":
+                            partial += data["token"]
+                            live_script.text(partial)
+                        elif event_name == "outline":
+                            partial = data["outline"]
+                            live_script.text(partial)
+                        elif event_name == "section":
+                            # Long scripts are written section by section, in parallel
+                            sections[data["index"]] = data["text"]
+                            live_script.text("\n\n".join(sections[i] for i in sorted(sections)))
+                        elif event_name in ("done", "error"):
+                            result = data
+                live_script.empty()
+                if resp.status_code == 200 and result.get("script"):
                     st.subheader("Generated Podcast Script")
-                    script = resp.json()["script"]
+                    script = result["script"]
                     st.text_area("Script", script, height=600)
                     with st.expander("Show LLM Prompt"):
-                        st.code(resp.json().get("prompt", ""))
+                        st.code(result.get("prompt", ""))
                     # Narration section
                     st.markdown("---")
                     st.subheader("Narrate & Play Podcast Audio")
                     tts_option = st.radio("Select TTS Engine", ["ElevenLabs", "Bark"], horizontal=True)
+                    draft = tts_option == "Bark" and st.checkbox("Draft quality (much faster, for a quick listen-through)")
                     if st.button("Narrate Podcast Audio"):
                         with st.spinner("Synthesizing podcast audio..."):
                             narrate_payload = {
@@ -98,18 +155,19 @@ if page == "Create Podcast Script":
                                 "char2": char2,
                                 "topic": topic
                             }
-                            if tts_option == "ElevenLabs":
-                                narrate_resp = requests.post(f"{API_BASE}/narrate_script", json=narrate_payload)
-                            else:
-                                narrate_resp = requests.post(f"{API_BASE}/narrate_script_bark", json=narrate_payload)
-                            if narrate_resp.status_code == 200 and narrate_resp.json().get("audio_path"):
-                                audio_path = narrate_resp.json()["audio_path"]
+                            if draft:
+                                narrate_payload["quality"] = "draft"
+                            result, error = run_narration_job(tts_option, narrate_payload)
+                            if result and result.get("audio_path"):
+                                audio_path = result["audio_path"]
                                 st.success("Podcast audio generated!")
+                                if result.get("real_time_factor"):
+                                    st.caption(f"{result['tier']} tier, real-time factor {result['real_time_factor']:.2f}")
                                 st.audio(audio_path)
                             else:
-                                st.error(f"Failed to generate audio: {narrate_resp.text}")
+                                st.error(f"Failed to generate audio: {error}")
                 else:
-                    st.error(f"Failed to generate script: {resp.text}")
+                    st.error(f"Failed to generate script: {result.get('error', resp.text)}")
 
 # --- Listen to Saved Podcast Page ---
 if page == "Listen to Saved Podcast":
@@ -138,6 +196,7 @@ if page == "Listen to Saved Podcast":
                     st.markdown(f"**Generated at:** {script_data['timestamp']}")
                     st.text_area("Script", script_data.get("script", ""), height=400)
                     tts_option = st.radio("Select TTS Engine", ["ElevenLabs", "Bark"], horizontal=True, key=f"tts_option_{selected_script}")
+                    draft = tts_option == "Bark" and st.checkbox("Draft quality (much faster, for a quick listen-through)", key=f"draft_{selected_script}")
                     if st.button("Narrate & Play This Script"):
                         with st.spinner("Synthesizing podcast audio..."):
                             narrate_payload = {
@@ -147,13 +206,14 @@ if page == "Listen to Saved Podcast":
                                 "char2": script_data.get("char2", ""),
                                 "topic": script_data.get("topic", ""),
                             }
-                            if tts_option == "ElevenLabs":
-                                narrate_resp = requests.post(f"{API_BASE}/narrate_script", json=narrate_payload)
-                            else:
-                                narrate_resp = requests.post(f"{API_BASE}/narrate_script_bark", json=narrate_payload)
-                            if narrate_resp.status_code == 200 and narrate_resp.json().get("audio_path"):
-                                audio_path = narrate_resp.json()["audio_path"]
+                            if draft:
+                                narrate_payload["quality"] = "draft"
+                            result, error = run_narration_job(tts_option, narrate_payload)
+                            if result and result.get("audio_path"):
+                                audio_path = result["audio_path"]
                                 st.success("Podcast audio generated!")
+                                if result.get("real_time_factor"):
+                                    st.caption(f"{result['tier']} tier, real-time factor {result['real_time_factor']:.2f}")
                                 st.audio(audio_path)
                             else:
-                                st.error(f"Failed to generate audio: {narrate_resp.text}")
+                                st.error(f"Failed to generate audio: {error}")
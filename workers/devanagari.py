@@ -0,0 +1,170 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# Table-driven Devanagari -> Latin (Hinglish) transliteration.
+# Common words come from LEXICON with their usual Hinglish spelling; everything else is built from the
+# character tables below, with inherent-vowel ("schwa") deletion applied right to left:
+#   - the final inherent vowel of a multi-syllable word is dropped (कमल -> kamal)
+#   - a medial one is dropped between a vowel and a single consonant+vowel (अपना -> apna, लड़की -> ladki),
+#     but kept before a conjunct (नमस्ते -> namaste)
+# Words whose spelling the rules cannot settle are marked low-confidence so the worker can send them to the LLM.
+
+LEXICON = {
+    "है": "hai", "हैं": "hain", "हूँ": "hoon", "हूं": "hoon", "हो": "ho", "था": "tha", "थी": "thi", "थे": "the",
+    "मैं": "main", "में": "mein", "मैंने": "maine", "हम": "hum", "हमें": "humein", "हमारा": "humara", "हमारी": "humari",
+    "हमारे": "humare", "आप": "aap", "आपका": "aapka", "आपकी": "aapki", "आपके": "aapke", "आपको": "aapko",
+    "तुम": "tum", "तुम्हारा": "tumhara", "तू": "tu", "मुझे": "mujhe", "मुझको": "mujhko", "मेरा": "mera", "मेरी": "meri",
+    "मेरे": "mere", "तेरा": "tera", "तेरी": "teri", "तेरे": "tere", "उसका": "uska", "उसकी": "uski", "उसके": "uske",
+    "उसको": "usko", "उसे": "use", "उन्हें": "unhe", "उनका": "unka", "उनकी": "unki", "उनके": "unke", "इसका": "iska",
+    "इसकी": "iski", "इसके": "iske", "इसको": "isko", "इसे": "ise", "यह": "yeh", "वह": "woh", "ये": "ye", "वो": "wo",
+    "यहाँ": "yahan", "यहां": "yahan", "वहाँ": "wahan", "वहां": "wahan", "कहाँ": "kahan", "कहां": "kahan",
+    "का": "ka", "की": "ki", "के": "ke", "को": "ko", "से": "se", "ने": "ne", "पर": "par", "तक": "tak", "लिए": "liye",
+    "और": "aur", "या": "ya", "लेकिन": "lekin", "तो": "to", "भी": "bhi", "ही": "hi", "कि": "ki",
+    "क्या": "kya", "क्यों": "kyun", "कैसे": "kaise", "कैसा": "kaisa", "कौन": "kaun", "कब": "kab", "जब": "jab",
+    "तब": "tab", "अब": "ab", "जो": "jo", "सब": "sab", "सबसे": "sabse", "कुछ": "kuch", "बहुत": "bahut", "बस": "bas",
+    "एक": "ek", "दो": "do", "तीन": "teen", "चार": "char", "पांच": "paanch", "नहीं": "nahi", "ना": "na", "न": "na",
+    "हाँ": "haan", "हां": "haan", "जी": "ji", "अच्छा": "accha", "अच्छी": "acchi", "अच्छे": "acche", "ठीक": "theek",
+    "बात": "baat", "बातें": "baatein", "लोग": "log", "लोगों": "logon", "दोस्तों": "doston", "दोस्त": "dost",
+    "भाई": "bhai", "यार": "yaar", "वीडियो": "video", "चैनल": "channel", "आज": "aaj", "कल": "kal", "फिर": "phir",
+    "साथ": "saath", "बाद": "baad", "पहले": "pehle", "अंदर": "andar", "बाहर": "bahar", "ऊपर": "upar", "नीचे": "neeche",
+    "कर": "kar", "करो": "karo", "करना": "karna", "करते": "karte", "करता": "karta", "करती": "karti", "किया": "kiya",
+    "रहा": "raha", "रही": "rahi", "रहे": "rahe", "गया": "gaya", "गई": "gayi", "गए": "gaye", "होता": "hota",
+    "होती": "hoti", "होते": "hote", "होगा": "hoga", "होगी": "hogi", "सकता": "sakta", "सकती": "sakti", "सकते": "sakte",
+    "चाहिए": "chahiye", "देखो": "dekho", "देखिए": "dekhiye", "बोलो": "bolo", "मतलब": "matlab", "समझ": "samajh",
+    "ज़िंदगी": "zindagi", "जिंदगी": "zindagi", "प्यार": "pyaar", "दिल": "dil", "काम": "kaam", "पैसा": "paisa",
+    "पैसे": "paise", "घर": "ghar", "दुनिया": "duniya", "सच": "sach", "सही": "sahi", "इतना": "itna", "उतना": "utna",
+    "जितना": "jitna", "ऐसा": "aisa", "ऐसे": "aise", "वैसे": "waise", "क्योंकि": "kyunki", "शायद": "shayad",
+}
+
+LEXICON = {unicodedata.normalize("NFC", word): latin for word, latin in LEXICON.items()}
+
+VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "ee", "उ": "u", "ऊ": "oo", "ऋ": "ri", "ए": "e", "ऐ": "ai",
+    "ओ": "o", "औ": "au", "ऑ": "o", "ऍ": "e",
+}
+MATRAS = {
+    "ा": "aa", "ि": "i", "ी": "ee", "ु": "u", "ू": "oo", "ृ": "ri", "े": "e", "ै": "ai", "ो": "o", "ौ": "au",
+    "ॉ": "o", "ॅ": "e",
+}
+CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n", "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n", "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m", "य": "y", "र": "r", "ल": "l", "व": "v", "श": "sh",
+    "ष": "sh", "स": "s", "ह": "h", "ळ": "l",
+}
+# Nukta letters are matched in NFC form, which writes them as base consonant + NUKTA
+NUKTA_FORMS = {"क": "q", "ख": "kh", "ग": "gh", "ज": "z", "ड": "d", "ढ": "dh", "फ": "f", "य": "y"}
+NUKTA = "़"
+VIRAMA = "्"
+ANUSVARA = "ं"
+CHANDRABINDU = "ँ"
+VISARGA = "ः"
+DIGITS = {chr(0x0966 + i): str(i) for i in range(10)}
+PUNCTUATION = {"।": ".", "॥": ".", "ॐ": "om", "ऽ": ""}
+LABIALS = ("p", "b", "m")
+SHORT_FINAL = {"aa": "a", "ee": "i", "oo": "u"}
+
+WORD = re.compile(r"[ऀ-ॣॱ-ॿ]+")
+DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+# Medial schwa decisions beyond this make a word's spelling a guess (long compounds, Sanskrit loans)
+MAX_CONFIDENT_SCHWA_DECISIONS = 2
+
+def _syllables(word):
+    """
+    Splits a word into [consonant_cluster, vowel, inherent, nasal, consonant_count] units.
+    Returns None on an unknown character.
+    """
+    units = []
+    cluster = []
+    i = 0
+    while i < len(word):
+        ch = word[i]
+        if ch in CONSONANTS:
+            latin = CONSONANTS[ch]
+            if i + 1 < len(word) and word[i + 1] == NUKTA:
+                latin = NUKTA_FORMS.get(ch, latin)
+                i += 1
+            cluster.append(latin)
+            if i + 1 < len(word) and word[i + 1] == VIRAMA:
+                i += 2
+                continue
+            if i + 1 < len(word) and word[i + 1] in MATRAS:
+                units.append(["".join(cluster), MATRAS[word[i + 1]], False, "", len(cluster)])
+                i += 2
+            else:
+                units.append(["".join(cluster), "a", True, "", len(cluster)])
+                i += 1
+            cluster = []
+            continue
+        if ch in VOWELS:
+            units.append(["", VOWELS[ch], False, "", 0])
+        elif ch in (ANUSVARA, CHANDRABINDU) and units:
+            units[-1][3] = "n"
+        elif ch == VISARGA and units:
+            units[-1][3] = "h"
+        elif ch == NUKTA:
+            pass
+        else:
+            return None
+        i += 1
+    if cluster:
+        # Trailing virama: consonants with no vowel
+        units.append(["".join(cluster), "", False, "", len(cluster)])
+    return units
+
+@lru_cache(maxsize=65536)
+def transliterate_word(word):
+    """
+    Returns (latin, confident) for one Devanagari word.
+    """
+    word = unicodedata.normalize("NFC", word)
+    if word in LEXICON:
+        return LEXICON[word], True
+    units = _syllables(word)
+    if units is None:
+        return word, False
+    decisions = 0
+    if len(units) > 1 and units[-1][2] and not units[-1][3]:
+        units[-1][1] = ""
+    for i in range(len(units) - 2, 0, -1):
+        if not units[i][2] or units[i][3]:
+            continue
+        decisions += 1
+        if units[i - 1][1] and units[i + 1][4] == 1 and units[i + 1][1]:
+            units[i][1] = ""
+    parts = []
+    for i, (cluster, vowel, _inherent, nasal, _count) in enumerate(units):
+        if i == len(units) - 1 and not nasal:
+            # Hinglish spells long final vowels short: करना -> karna, लड़की -> ladki (only the final one: पानी -> paani)
+            vowel = SHORT_FINAL.get(vowel, vowel)
+        if nasal == "n" and i + 1 < len(units) and units[i + 1][0].startswith(LABIALS):
+            nasal = "m"
+        parts.append(cluster + vowel + nasal)
+    return "".join(parts), decisions <= MAX_CONFIDENT_SCHWA_DECISIONS
+
+def segments(text):
+    """
+    Transliterates text in one pass, returning [(source, latin, confident)] pieces that cover it exactly.
+    Non-Devanagari text passes through unchanged and is always confident.
+    """
+    pieces = []
+    pos = 0
+    for match in WORD.finditer(text):
+        if match.start() > pos:
+            pieces.append(_passthrough(text[pos:match.start()]))
+        latin, confident = transliterate_word(match.group())
+        pieces.append((match.group(), latin, confident))
+        pos = match.end()
+    if pos < len(text):
+        pieces.append(_passthrough(text[pos:]))
+    return pieces
+
+def _passthrough(source):
+    if DEVANAGARI.search(source):
+        source_latin = "".join(DIGITS.get(ch, PUNCTUATION.get(ch, ch)) for ch in source)
+        return source, source_latin, True
+    return source, source, True
+
+def transliterate(text):
+    return "".join(latin for _source, latin, _confident in segments(text))
@@ -1,23 +1,30 @@
 import os
+import argparse
 import json
 import pathlib
 import logging
-import requests
+import asyncio
 import time
+import hashlib
 from config import settings
 from backend.core.prompt_utility import get_transliteration_prompt
-
-def chunk_text(text, max_words=500):
-    words = text.split()
-    for i in range(0, len(words), max_words):
-        yield ' '.join(words[i:i+max_words])
+from backend.core import chunker, corpus_store, sentence_index
+from backend.core.disk_cache import DiskLRUCache, cache_key
+from backend.core.ollama_client import OllamaError, ollama
+from workers import devanagari
 
 def contains_devanagari(text):
     import re
     return bool(re.search(r'[\u0900-\u097F]', text))
 
-OLLAMA_URL = settings.OLLAMA_URL
 TRANSCRIPTS_DIR = pathlib.Path(settings.TRANSCRIPTS_DIR)
+TRANSLITERATION_MODEL = "gemma3:4b"
+# Intros, outros and sponsor reads repeat across videos; identical chunks are answered from disk.
+# The template hash keys on the prompt wording, so editing the prompt invalidates old entries.
+transliteration_cache = DiskLRUCache(settings.TRANSLITERATION_CACHE_DB, settings.TRANSLITERATION_CACHE_MAX_BYTES)
+PROMPT_TEMPLATE_HASH = hashlib.sha256(get_transliteration_prompt("").encode("utf-8")).hexdigest()
+# Whole sentences packed up to a share of the context window; the answer is about as long as the input
+CHUNK_TOKENS = chunker.token_budget(get_transliteration_prompt(""))
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,7 +36,173 @@ logging.basicConfig(
 )
 logger = logging.getLogger("transliteration_worker")
 
-def transliterate_file(json_path):
+class RunStats:
+    """
+    Throughput counters for one worker run.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.files = 0
+        self.chunks = 0
+        self.eval_count = 0
+        self.rule_words = 0
+
+    def report(self):
+        elapsed = max(time.time() - self.started, 1e-9)
+        logger.info(
+            f"Transliterated {self.files} files, {self.chunks} chunks in {elapsed:.1f}s: "
+            f"{self.chunks / elapsed:.2f} chunks/sec, {self.eval_count / elapsed:.1f} tokens/sec; "
+            f"{self.rule_words} words handled by rules"
+        )
+        cache = transliteration_cache.stats()
+        logger.info(
+            f"Transliteration cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%}), "
+            f"{cache['entries']} entries / {cache['bytes']} bytes"
+        )
+
+class Checkpoint:
+    """
+    Per-file record of finished chunks, appended as each one completes so an interrupted file resumes
+    where it left off. The header pins the source text and chunking mode; a mismatch starts over.
+    """
+
+    def __init__(self, json_path, transcript, mode):
+        json_path = pathlib.Path(json_path)
+        self.path = pathlib.Path(settings.TRANSLITERATION_CHECKPOINT_DIR) / json_path.parent.name / f"{json_path.stem}.jsonl"
+        header = {"source_hash": hashlib.sha256(transcript.encode("utf-8")).hexdigest(), "mode": mode}
+        self.done = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+            if lines and lines[0] == header:
+                self.done = {entry["index"]: entry["text"] for entry in lines[1:]}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.done:
+            logger.info(f"Resuming {json_path} from checkpoint with {len(self.done)} chunks done")
+        else:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(header) + "\n")
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, index, text):
+        self._file.write(json.dumps({"index": index, "text": text}, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def remove(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+# transliterate_chunk's answer when, with require_latin, the model kept Devanagari: the fallback spelling
+# is final for that chunk, unlike an Ollama failure, which is retried on the next run
+KEEP_FALLBACK = object()
+
+class IncompleteTransliteration(Exception):
+    """
+    Some chunks failed; the finished ones stay in the checkpoint and the file is retried on the next scan.
+    """
+
+async def transliterate_chunk(idx, total, chunk, limiter, stats, require_latin=False):
+    """
+    Returns the LLM transliteration of one chunk, None if Ollama failed, or KEEP_FALLBACK if (with
+    require_latin) the model answered with Devanagari still in it.
+    """
+    key = cache_key(TRANSLITERATION_MODEL, PROMPT_TEMPLATE_HASH, chunk)
+    cached = await asyncio.to_thread(transliteration_cache.get, key)
+    if cached is not None:
+        stats.chunks += 1
+        return cached.decode("utf-8")
+    async with limiter:
+        logger.info(f"Processing chunk {idx+1}/{total}")
+        prompt = get_transliteration_prompt(chunk)
+        try:
+            result = await ollama.generate(TRANSLITERATION_MODEL, prompt, {"num_ctx": settings.OLLAMA_NUM_CTX})
+        except OllamaError as e:
+            logger.error(f"Ollama transliteration error: {e}")
+            return None
+    stats.chunks += 1
+    if require_latin and contains_devanagari(result["response"]):
+        logger.warning(f"Chunk {idx+1} came back with Devanagari, keeping the rule-based spelling")
+        return KEEP_FALLBACK
+    if result["response"]:
+        await asyncio.to_thread(transliteration_cache.put, key, result["response"].encode("utf-8"))
+    stats.eval_count += result["stats"]["eval_count"]
+    logger.info(f"Chunk {idx+1} result (first 100 chars): {result['response'][:100]}")
+    return result["response"]
+
+async def transliterate_chunks(chunks, limiter, stats, checkpoint, fallbacks=None, require_latin=False):
+    """
+    Transliterates chunks concurrently, skipping ones already in the checkpoint; results keep the input order.
+    Finished chunks are checkpointed as they complete. If any chunk failed, raises IncompleteTransliteration
+    once the rest have settled, so the file is not saved and a re-run retries only the failed chunks.
+    """
+    failed = []
+
+    async def run(idx, chunk):
+        if idx in checkpoint.done:
+            return checkpoint.done[idx]
+        text = await transliterate_chunk(idx, len(chunks), chunk, limiter, stats, require_latin)
+        if text is None:
+            failed.append(idx)
+            return None
+        if text is KEEP_FALLBACK:
+            text = fallbacks[idx] if fallbacks else chunk
+        checkpoint.record(idx, text)
+        return text
+
+    # Let every chunk settle before surfacing an error, so all finished work reaches the checkpoint
+    results = await asyncio.gather(*(run(idx, chunk) for idx, chunk in enumerate(chunks)), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    if failed:
+        raise IncompleteTransliteration(f"{len(failed)} of {len(chunks)} chunks failed; finished chunks are checkpointed and the rest will be retried")
+    return results
+
+async def transliterate_with_rules(transcript, limiter, stats, checkpoint):
+    """
+    Runs the rule-based engine over the whole transcript and sends only low-confidence spans
+    (runs of uncertain words separated by whitespace) to the LLM. Spans are capped at CHUNK_TOKENS
+    like the chunks of the LLM-only mode, so a long uncertain run never overflows the context window.
+    """
+    pieces = devanagari.segments(transcript)
+    outputs = [latin for _source, latin, _confident in pieces]
+    spans = []
+    span_tokens = 0
+    for idx, (source, _latin, confident) in enumerate(pieces):
+        if confident:
+            continue
+        tokens = chunker.estimate_tokens(source)
+        if spans and all(pieces[j][0].isspace() for j in range(spans[-1][1] + 1, idx)) and span_tokens + tokens <= CHUNK_TOKENS:
+            spans[-1][1] = idx
+            span_tokens += tokens
+        else:
+            spans.append([idx, idx])
+            span_tokens = tokens
+    uncertain = sum(1 for _source, _latin, confident in pieces if not confident)
+    stats.rule_words += sum(1 for source, _latin, _confident in pieces if not source.isspace()) - uncertain
+    logger.info(f"Rules handled {len(pieces)} pieces; sending {len(spans)} low-confidence spans to the LLM")
+    results = await transliterate_chunks(
+        ["".join(pieces[j][0] for j in range(first, last + 1)) for first, last in spans], limiter, stats, checkpoint,
+        fallbacks=["".join(outputs[first:last + 1]) for first, last in spans], require_latin=True
+    )
+    for (first, last), text in zip(spans, results):
+        outputs[first:last + 1] = [text.strip()] + [""] * (last - first)
+    return "".join(outputs)
+
+def save_transliteration(json_path, data):
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    if corpus_store.enabled():
+        corpus_store.put(pathlib.Path(json_path).parent.name, data)
+    sentence_index.add_transcript(pathlib.Path(json_path).parent.name, data.get("video_id"), data["transcript"])
+
+async def transliterate_file(json_path, limiter=None, stats=None):
+    limiter = limiter or asyncio.Semaphore(settings.TRANSLITERATION_MAX_IN_FLIGHT)
+    stats = stats or RunStats()
     with open(json_path, encoding="utf-8") as f:
         data = json.load(f)
     transcript = data.get("transcript")
@@ -49,50 +222,130 @@ def transliterate_file(json_path):
         logger.info(f"No Devanagari found in: {json_path}")
         return False
     logger.info(f"Transliterating: {json_path}")
-    chunks = list(chunk_text(transcript, max_words=500))
-    transliterated_chunks = []
-    for idx, chunk in enumerate(chunks):
-        logger.info(f"Processing chunk {idx+1}/{len(chunks)}")
-        prompt = get_transliteration_prompt(chunk)
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": "gemma3:4b",
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=600
-        )
-        if response.status_code == 200:
-            result = response.json()
-            transliterated_chunk = result.get("response", "")
-            logger.info(f"Chunk {idx+1} result (first 100 chars): {transliterated_chunk[:100]}")
-            transliterated_chunks.append(transliterated_chunk)
+    mode = f"rules:{CHUNK_TOKENS}" if settings.TRANSLITERATION_RULES_ENABLED else f"chunks:{CHUNK_TOKENS}"
+    checkpoint = Checkpoint(json_path, transcript, mode)
+    try:
+        if settings.TRANSLITERATION_RULES_ENABLED:
+            transliterated = await transliterate_with_rules(transcript, limiter, stats, checkpoint)
         else:
-            logger.error(f"Ollama transliteration error: {response.text}")
-            transliterated_chunks.append(chunk)
-    transliterated = ' '.join(transliterated_chunks)
+            chunks = chunker.chunk_text(transcript, CHUNK_TOKENS)
+            logger.info(f"Split into {len(chunks)} chunks of up to {CHUNK_TOKENS} tokens")
+            # All chunks are in flight at once up to the limiter; gather keeps them in their original order.
+            # Chunks end on sentence boundaries with their trailing whitespace, which the model may drop.
+            results = await transliterate_chunks([c["text"].strip() for c in chunks], limiter, stats, checkpoint)
+            transliterated = ' '.join(text.strip() for text in results)
+    except BaseException:
+        checkpoint.close()
+        raise
     data["transcript_original"] = transcript
     data["transcript"] = transliterated
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    await asyncio.to_thread(save_transliteration, json_path, data)
+    checkpoint.remove()
+    stats.files += 1
     logger.info(f"Transliteration complete and saved for {json_path}")
     return True
 
-def scan_and_transliterate():
-    for channel_dir in TRANSCRIPTS_DIR.iterdir():
-        if not channel_dir.is_dir():
-            continue
-        for json_file in channel_dir.glob("*.json"):
+class Manifest:
+    """
+    Remembers every transcript file the worker has handled by path, mtime, size and content hash,
+    so a scan only opens files that are new or have actually changed.
+    """
+
+    def __init__(self, path=None):
+        self.path = pathlib.Path(path or settings.TRANSLITERATION_MANIFEST)
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def _fingerprint(self, json_file):
+        stat = json_file.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def is_current(self, json_file):
+        entry = self.entries.get(str(json_file))
+        if entry is None:
+            return False
+        mtime, size = self._fingerprint(json_file)
+        if (entry["mtime"], entry["size"]) == (mtime, size):
+            return True
+        # Touched but not changed: refresh the stat fields and keep skipping it
+        if entry["hash"] == file_hash(json_file):
+            entry["mtime"], entry["size"] = mtime, size
+            return True
+        return False
+
+    def mark(self, json_file):
+        mtime, size = self._fingerprint(json_file)
+        self.entries[str(json_file)] = {"mtime": mtime, "size": size, "hash": file_hash(json_file)}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+async def scan_and_transliterate(manifest=None):
+    # One chunk limiter shared by every file, so Ollama sees a steady TRANSLITERATION_MAX_IN_FLIGHT requests
+    limiter = asyncio.Semaphore(settings.TRANSLITERATION_MAX_IN_FLIGHT)
+    file_slots = asyncio.Semaphore(settings.TRANSLITERATION_FILE_CONCURRENCY)
+    manifest = manifest or Manifest()
+    stats = RunStats()
+
+    async def process(json_file):
+        async with file_slots:
             try:
-                transliterate_file(json_file)
+                await transliterate_file(json_file, limiter, stats)
             except Exception as e:
                 logger.error(f"Error processing {json_file}: {e}")
+                return
+            # Recorded after our own rewrite of the file, so the next scan sees it as unchanged
+            manifest.mark(json_file)
+            manifest.save()
+
+    json_files = [
+        f for channel_dir in TRANSCRIPTS_DIR.iterdir() if channel_dir.is_dir()
+        for f in channel_dir.glob("*.json") if not manifest.is_current(f)
+    ]
+    if json_files:
+        logger.info(f"{len(json_files)} new or changed transcripts to check")
+        await asyncio.gather(*(process(json_file) for json_file in json_files))
+        stats.report()
+    manifest.save()
+    return stats
+
+async def watch(interval):
+    """
+    Daemon mode: polls for new or changed transcripts every interval seconds. Unchanged files cost one stat().
+    """
+    manifest = Manifest()
+    logger.info(f"Watching {TRANSCRIPTS_DIR} every {interval}s")
+    while True:
+        await scan_and_transliterate(manifest)
+        await asyncio.sleep(interval)
+
+async def main(watch_interval=None):
+    try:
+        if watch_interval:
+            await watch(watch_interval)
+        else:
+            await scan_and_transliterate()
+    finally:
+        await ollama.aclose()
 
 if __name__ == "__main__":
-    # while True:
+    parser = argparse.ArgumentParser(description="Transliterate Hindi transcripts to Hinglish")
+    parser.add_argument("--watch", action="store_true", help="keep running and pick up new or changed transcripts")
+    parser.add_argument("--interval", type=int, default=settings.TRANSLITERATION_WATCH_INTERVAL_SECONDS, help="seconds between scans in watch mode")
+    args = parser.parse_args()
     logger.info("Scanning for Hindi transcripts to transliterate...")
-    scan_and_transliterate()
+    asyncio.run(main(args.interval if args.watch else None))
     logger.info("Transliteration complete")
-    # logger.info("Sleeping for 60 seconds...")
-    # time.sleep(60)